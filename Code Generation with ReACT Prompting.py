@@ -1,17 +1,1028 @@
 import os
 import time
 import sys
+import json
+import argparse
+import asyncio
+import bisect
+import cProfile
+import functools
+import hashlib
+import marshal
+import multiprocessing
+import platform
+import pstats
+import queue
+import sqlite3
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+from importlib.util import MAGIC_NUMBER
 from io import StringIO
-from typing import Dict, List
+from itertools import islice
+from typing import (AsyncIterator, Callable, Dict, Generator, Iterable, Iterator, List,
+                    NamedTuple, Optional, TextIO, Tuple)
 
-class ReACTCodeGenerator:
+from terminal_renderer import TerminalRenderer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; rlimits are skipped there
+    resource = None
+
+class CappedOutput(StringIO):
+    """A text buffer that silently drops everything past ``limit`` characters.
+    
+    ``on_write`` is called with every piece of text actually kept, which
+    lets callers stream output while the snippet is still running.
+    """
+    
+    def __init__(self, limit: Optional[int] = None,
+                 on_write: Optional[Callable[[str], None]] = None):
+        super().__init__()
+        self.limit = limit
+        self.on_write = on_write
+        self.truncated = False
+    
+    def write(self, text: str) -> int:
+        kept = text
+        if self.limit is not None:
+            room = self.limit - self.tell()
+            if len(text) > room:
+                self.truncated = True
+                kept = text[:max(room, 0)]
+        if kept:
+            super().write(kept)
+            if self.on_write is not None:
+                self.on_write(kept)
+        return len(text)
+
+def _drain(steps: Generator):
+    """Exhaust a generator and return its return value"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+class CodeCache:
+    """Bounded LRU cache of compiled snippets keyed by a hash of their source.
+    
+    The set of distinct generated snippets is tiny compared with the number
+    of executions, so most runs can skip ``compile()`` entirely. With
+    ``cache_dir`` set, code objects are also marshalled to disk (tagged with
+    the interpreter's bytecode magic number) and survive restarts.
+    """
+    
+    def __init__(self, maxsize: int = 256, cache_dir: Optional[str] = None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    def lookup(self, source: str) -> Tuple[object, str]:
+        """Return the code object for ``source`` and where it came from
+        ('memory', 'disk' or 'compiled')"""
+        key = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return code, 'memory'
+        
+        code = self._load(key)
+        if code is not None:
+            origin = 'disk'
+        else:
+            code = compile(source, '<react-snippet>', 'exec')
+            self._save(key, code)
+            origin = 'compiled'
+        
+        with self._lock:
+            if origin == 'disk':
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            if self.maxsize > 0:
+                self._entries[key] = code
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return code, origin
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{sys.implementation.cache_tag}.bin")
+    
+    def _load(self, key: str):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data.startswith(MAGIC_NUMBER):
+            return None
+        try:
+            return marshal.loads(data[len(MAGIC_NUMBER):])
+        except (EOFError, ValueError, TypeError):
+            return None
+    
+    def _save(self, key: str, code):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(MAGIC_NUMBER + marshal.dumps(code))
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                    'misses': self.misses, 'size': len(self._entries)}
+
+def _exec_profiled(compiled, namespace: Dict, report: Dict):
+    """exec() under cProfile and tracemalloc, filling ``report`` with the
+    peak memory allocated by the snippet and its top functions"""
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        exec(compiled, namespace)
+    finally:
+        profiler.disable()
+        report['peak_memory_bytes'] = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+        if not already_tracing:
+            tracemalloc.stop()
+        stats_text = StringIO()
+        pstats.Stats(profiler, stream=stats_text).sort_stats('cumulative').print_stats(10)
+        report['stats'] = stats_text.getvalue()
+
+def run_snippet(code: str, max_output: Optional[int] = None,
+                redirect: bool = False,
+                code_cache: Optional[CodeCache] = None,
+                profile: bool = False,
+                on_output: Optional[Callable[[str], None]] = None) -> Dict[str, str]:
+    """Execute a snippet in a fresh namespace and capture what it prints.
+    
+    Output is captured through a ``print`` bound to a private buffer rather
+    than by swapping the global ``sys.stdout``, so concurrent callers never
+    see each other's output or globals. ``redirect`` additionally captures
+    direct ``sys.stdout``/``sys.stderr`` writes and is only safe in a
+    single-threaded process such as a sandbox worker. ``profile`` adds a
+    cProfile/tracemalloc report of the run under the 'profile' key, and
+    ``on_output`` receives output chunks as soon as they are printed.
+    """
+    captured_output = CappedOutput(max_output, on_output)
+    namespace = {
+        '__name__': '__react_snippet__',
+        'print': functools.partial(print, file=captured_output)
+    }
+    
+    status = 'ok'
+    error = ''
+    origin = 'compiled'
+    report = {}
+    run = functools.partial(_exec_profiled, report=report) if profile else exec
+    try:
+        if code_cache is not None:
+            compiled, origin = code_cache.lookup(code)
+        else:
+            compiled = compile(code, '<react-snippet>', 'exec')
+        if redirect:
+            with redirect_stdout(captured_output), redirect_stderr(captured_output):
+                run(compiled, namespace)
+        else:
+            run(compiled, namespace)
+    except KeyboardInterrupt:
+        raise
+    except BaseException as e:
+        # sys.exit() and friends end the snippet, not the host process
+        status = 'error'
+        error = (str(e) if isinstance(e, Exception) else repr(e)) or type(e).__name__
+    
+    output = captured_output.getvalue()
+    if captured_output.truncated:
+        output += f"\n[output truncated at {max_output} characters]"
+    result = {'status': status, 'output': output, 'error': error, 'compile_cache': origin}
+    if report:
+        result['profile'] = report
+    return result
+
+class InProcessExecutor:
+    """Run snippets in the host interpreter: fastest, but with no isolation"""
+    
+    def __init__(self, max_output: Optional[int] = None,
+                 code_cache: Optional[CodeCache] = None, profile: bool = False):
+        self.max_output = max_output
+        self.code_cache = code_cache if code_cache is not None else CodeCache()
+        self.profile = profile
+    
+    def execute(self, code: str,
+                on_output: Optional[Callable[[str], None]] = None) -> Dict[str, str]:
+        """Run ``code`` and return its status, output and error"""
+        return run_snippet(code, self.max_output, code_cache=self.code_cache,
+                           profile=self.profile, on_output=on_output)
+    
+    def stream(self, code: str) -> Generator[str, None, Dict[str, str]]:
+        """Run ``code`` in a helper thread, yielding output chunks as they are
+        printed; the generator returns the final result"""
+        chunks = queue.Queue()
+        outcome = []
+        
+        def target():
+            try:
+                outcome.append(self.execute(code, on_output=chunks.put))
+            finally:
+                chunks.put(None)
+        
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+        thread.join()
+        if not outcome:
+            return {'status': 'crashed', 'output': '', 'error': "Snippet aborted the executor thread"}
+        return outcome[0]
+    
+    async def execute_async(self, code: str) -> Dict[str, str]:
+        """Run ``code`` in a thread without blocking the event loop.
+        
+        A snippet running in this interpreter cannot be stopped, so
+        cancellation only abandons it; use SubprocessExecutor to kill it.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.execute, code)
+    
+    def stats(self) -> Dict[str, int]:
+        """Compiled-code cache counters"""
+        return self.code_cache.stats()
+    
+    def close(self):
+        """Nothing to release"""
+
+def _sandbox_worker(conn, memory_mb: Optional[int], max_output: Optional[int],
+                    cache_size: int, cache_dir: Optional[str], profile: bool):
+    """Serve snippets sent over ``conn`` until the pipe closes"""
+    code_cache = CodeCache(cache_size, cache_dir)
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    
+    while True:
+        try:
+            code, cpu_seconds, stream = conn.recv()
+        except (EOFError, OSError):
+            return
+        
+        if resource is not None and cpu_seconds:
+            # RLIMIT_CPU counts the whole life of the process, so each
+            # snippet gets a budget on top of what the worker already used
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            spent = usage.ru_utime + usage.ru_stime
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = int(spent + cpu_seconds) + 1
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        
+        on_output = functools.partial(_send_chunk, conn) if stream else None
+        result = run_snippet(code, max_output, redirect=True, code_cache=code_cache,
+                             profile=profile, on_output=on_output)
+        conn.send(('done', result))
+
+def _send_chunk(conn, text: str):
+    conn.send(('chunk', text))
+
+class _SandboxWorker:
+    """One pre-forked interpreter that executes snippets sent over a pipe"""
+    
+    def __init__(self, memory_mb: Optional[int], max_output: Optional[int],
+                 cache_size: int, cache_dir: Optional[str], profile: bool):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_sandbox_worker,
+            args=(child_conn, memory_mb, max_output, cache_size, cache_dir, profile),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+    
+    def run(self, code: str, timeout: Optional[float], cpu_seconds: Optional[float],
+            stream: bool = False) -> Generator[str, None, Dict[str, str]]:
+        """Execute one snippet, killing the worker if it overruns ``timeout``.
+        
+        With ``stream`` set the worker forwards output chunks as they are
+        printed and they are yielded here; the generator returns the result.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self.conn.send((code, cpu_seconds, stream))
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not self.conn.poll(remaining):
+                    break
+                kind, payload = self.conn.recv()
+                if kind == 'done':
+                    return payload
+                yield payload
+        except (EOFError, OSError):
+            self.kill()
+            return {'status': 'crashed', 'output': '',
+                    'error': f"Sandbox worker died (exit code {self.process.exitcode})"}
+        
+        self.kill()
+        return {'status': 'timeout', 'output': '',
+                'error': f"Execution timed out after {timeout}s"}
+    
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+    
+    def kill(self):
+        """Terminate the worker process immediately"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class SubprocessExecutor:
+    """Run snippets in a pool of reusable, resource-limited worker processes.
+    
+    Workers are forked once and reused, so interpreter start-up is paid per
+    worker rather than per snippet. A worker that times out, exceeds its
+    CPU/memory limits or crashes is replaced with a fresh one.
+    """
+    
+    def __init__(self, workers: int = 1, timeout: Optional[float] = 5.0,
+                 cpu_seconds: Optional[float] = None, memory_mb: Optional[int] = 256,
+                 max_output: Optional[int] = 64 * 1024, cache_size: int = 256,
+                 cache_dir: Optional[str] = None, profile: bool = False):
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self.profile = profile
+        self.workers = max(1, workers)
+        # Each worker has its own code cache; counters are tallied here from
+        # the origin reported with every result
+        self._cache_counts = {'memory': 0, 'disk': 0, 'compiled': 0}
+        self._idle = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+    
+    def _spawn(self) -> _SandboxWorker:
+        return _SandboxWorker(self.memory_mb, self.max_output, self.cache_size,
+                              self.cache_dir, self.profile)
+    
+    def execute(self, code: str) -> Dict[str, str]:
+        """Run ``code`` on an idle worker and return its status, output and error"""
+        return _drain(self._run(code, False))
+    
+    def stream(self, code: str) -> Generator[str, None, Dict[str, str]]:
+        """Run ``code`` on an idle worker, yielding output chunks as they are
+        printed; the generator returns the final result"""
+        return self._run(code, True)
+    
+    def _run(self, code: str, stream: bool) -> Generator[str, None, Dict[str, str]]:
+        worker = self._idle.get()
+        finished = False
+        try:
+            result = yield from worker.run(code, self.timeout, self.cpu_seconds, stream)
+            finished = True
+        finally:
+            # A worker abandoned mid-run may still be executing the snippet
+            if not finished or not worker.alive:
+                worker.kill()
+                worker = self._spawn()
+            self._idle.put(worker)
+        
+        self._count(result)
+        return result
+    
+    async def execute_async(self, code: str) -> Dict[str, str]:
+        """Run ``code`` on an idle worker without blocking the event loop.
+        
+        Cancelling the coroutine kills the worker process running the
+        snippet and replaces it with a fresh one.
+        """
+        loop = asyncio.get_running_loop()
+        # Poll for an idle worker rather than blocking a thread on the queue,
+        # so a cancelled waiter can never take a worker and leak it
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+                break
+            except queue.Empty:
+                await asyncio.sleep(0.005)
+        
+        replace = False
+        try:
+            result = await loop.run_in_executor(
+                None, _drain, worker.run(code, self.timeout, self.cpu_seconds)
+            )
+        except asyncio.CancelledError:
+            # The thread waiting on the pipe sees EOF and finishes on its own
+            replace = True
+            worker.process.kill()
+            raise
+        finally:
+            if replace or not worker.alive:
+                if not replace:
+                    worker.kill()
+                worker = self._spawn()
+            self._idle.put(worker)
+        
+        self._count(result)
+        return result
+    
+    def _count(self, result: Dict[str, str]):
+        origin = result.get('compile_cache')
+        if origin in self._cache_counts:
+            self._cache_counts[origin] += 1
+    
+    def stats(self) -> Dict[str, int]:
+        """Compiled-code cache counters summed over all workers"""
+        counts = dict(self._cache_counts)
+        return {'hits': counts['memory'], 'disk_hits': counts['disk'],
+                'misses': counts['compiled']}
+    
+    def close(self):
+        """Shut down all idle workers"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            worker.kill()
+
+def make_executor(kind: str = 'inprocess', **options):
+    """Build an executor backend by name ('inprocess' or 'subprocess')"""
+    if kind == 'inprocess':
+        code_cache = CodeCache(options.get('cache_size', 256), options.get('cache_dir'))
+        return InProcessExecutor(max_output=options.get('max_output'), code_cache=code_cache,
+                                 profile=options.get('profile', False))
+    if kind == 'subprocess':
+        return SubprocessExecutor(**options)
+    raise ValueError(f"Unknown executor: {kind}")
+
+class ResultCache:
+    """Memoize the results of deterministic snippets.
+    
+    Results (status, captured output and error) are keyed on the snippet's
+    hash and the interpreter version, expire after ``ttl`` seconds and are
+    evicted oldest-first beyond ``maxsize`` entries. With ``path`` set, the
+    cache is also kept in a local SQLite file shared by runs and processes.
+    Timeouts and crashes are never cached.
+    """
+    
+    CACHEABLE = ('ok', 'error')
+    
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._interpreter = f"{sys.implementation.name}-{platform.python_version()}"
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_created ON results(created)")
+            self._trim_db()
+    
+    def _key(self, code: str) -> str:
+        digest = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        return f"{self._interpreter}:{digest}"
+    
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+    
+    def get(self, code: str) -> Optional[Dict[str, str]]:
+        """Return the cached result for ``code``, or None"""
+        key = self._key(code)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, result = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(result)
+                del self._entries[key]
+            
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT result, created FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    result = json.loads(row[0])
+                    self._remember(key, row[1], result)
+                    self.hits += 1
+                    return dict(result)
+            
+            self.misses += 1
+            return None
+    
+    def put(self, code: str, result: Dict[str, str]):
+        """Store ``result`` for ``code`` if it is deterministic"""
+        if result.get('status') not in self.CACHEABLE:
+            return
+        result = {k: result[k] for k in ('status', 'output', 'error')}
+        key = self._key(code)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, result)
+            if self._db is not None:
+                inserted = self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, result, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(result), now)
+                ).rowcount
+                # Counted optimistically (a replace also counts as one);
+                # _trim_db() recounts before evicting
+                self._db_size += inserted
+                if self._db_size > self.maxsize:
+                    self._trim_db()
+                else:
+                    self._db.commit()
+    
+    def _trim_db(self):
+        """Evict the oldest rows beyond ``maxsize`` and commit"""
+        self._db_size = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if self._db_size > self.maxsize:
+            self._db.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY created LIMIT ?)",
+                (self._db_size - self.maxsize,)
+            )
+            self._db_size = self.maxsize
+        self._db.commit()
+    
+    def _remember(self, key: str, created: float, result: Dict[str, str]):
+        self._entries[key] = (created, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current in-memory size"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+    
+    def close(self):
+        """Close the SQLite file, if any"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+class Histogram:
+    """Log-bucketed histogram with cheap quantile estimates.
+    
+    Buckets grow by a factor of 2**(1/4) (about 19% resolution) from
+    ``base``; quantiles are reported as the upper bound of the bucket
+    holding them, capped at the largest value seen.
+    """
+    
+    STEPS_PER_DOUBLING = 4
+    
+    def __init__(self, base: float = 1e-6, doublings: int = 28):
+        self.bounds = [base * 2 ** (i / self.STEPS_PER_DOUBLING)
+                       for i in range(doublings * self.STEPS_PER_DOUBLING + 1)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+    
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+    
+    def cumulative(self) -> Iterator[Tuple[float, int]]:
+        """Yield (upper bound, cumulative count) at every power of two"""
+        seen = 0
+        for index, bound in enumerate(self.bounds):
+            seen += self.counts[index]
+            if index % self.STEPS_PER_DOUBLING == 0:
+                yield bound, seen
+    
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max
+        }
+
+class PhaseMetrics:
+    """Per-phase timing histograms plus snippet peak-memory statistics.
+    
+    Timings come from ``time.perf_counter`` around each phase method, so
+    they exclude screen redraws and waiting for the user. Results carry
+    their own timings, which lets a parent process merge metrics gathered
+    in pool workers.
+    """
+    
     def __init__(self):
-        self.current_phase = 0
-        self.task_description = ""
-        self.reasoning_log = []
-        self.generated_code = ""
-        self.execution_output = ""
-        self.execution_error = ""
+        self.phases = OrderedDict()
+        self.memory = Histogram(base=64, doublings=30)
+    
+    def observe(self, phase_id: str, seconds: float):
+        histogram = self.phases.get(phase_id)
+        if histogram is None:
+            histogram = self.phases[phase_id] = Histogram()
+        histogram.observe(seconds)
+    
+    def record(self, result: Dict):
+        """Fold the timings and profile of one task result into the histograms"""
+        for phase_id, seconds in result.get('timings', {}).items():
+            self.observe(phase_id, seconds)
+        profile = result.get('profile')
+        if profile:
+            self.memory.observe(profile['peak_memory_bytes'])
+    
+    def to_dict(self) -> Dict:
+        data = {'phases': {phase_id: histogram.summary()
+                           for phase_id, histogram in self.phases.items()}}
+        if self.memory.count:
+            data['exec_peak_memory_bytes'] = self.memory.summary()
+        return data
+    
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+    
+    def to_prometheus(self) -> str:
+        """Render the histograms in the Prometheus text exposition format"""
+        lines = [
+            "# HELP react_phase_duration_seconds Time spent in each ReACT phase.",
+            "# TYPE react_phase_duration_seconds histogram"
+        ]
+        for phase_id, histogram in self.phases.items():
+            for bound, seen in histogram.cumulative():
+                lines.append(f'react_phase_duration_seconds_bucket{{phase="{phase_id}",le="{bound:.6g}"}} {seen}')
+            lines.append(f'react_phase_duration_seconds_bucket{{phase="{phase_id}",le="+Inf"}} {histogram.count}')
+            lines.append(f'react_phase_duration_seconds_sum{{phase="{phase_id}"}} {histogram.total:.9f}')
+            lines.append(f'react_phase_duration_seconds_count{{phase="{phase_id}"}} {histogram.count}')
+        lines.append("# HELP react_phase_duration_quantile_seconds Estimated phase duration quantiles.")
+        lines.append("# TYPE react_phase_duration_quantile_seconds gauge")
+        for phase_id, histogram in self.phases.items():
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'react_phase_duration_quantile_seconds{{phase="{phase_id}",quantile="{q}"}} {histogram.quantile(q):.9f}')
+        if self.memory.count:
+            lines.append("# HELP react_exec_peak_memory_bytes Peak memory allocated by executed snippets.")
+            lines.append("# TYPE react_exec_peak_memory_bytes histogram")
+            for bound, seen in self.memory.cumulative():
+                lines.append(f'react_exec_peak_memory_bytes_bucket{{le="{bound:.0f}"}} {seen}')
+            lines.append(f'react_exec_peak_memory_bytes_bucket{{le="+Inf"}} {self.memory.count}')
+            lines.append(f'react_exec_peak_memory_bytes_sum {self.memory.total:.0f}')
+            lines.append(f'react_exec_peak_memory_bytes_count {self.memory.count}')
+        return "\n".join(lines) + "\n"
+
+TASK_TEMPLATES = [
+    {
+        'id': 'fibonacci',
+        'keywords': ['fibonacci'],
+        'reasoning': [
+            "This is a sequence generation problem",
+            "Can be solved iteratively or recursively",
+            "Iterative approach is more efficient for large n",
+            "Need to handle base cases (n=0, n=1)"
+        ],
+        'plan': [
+            "Step 1: Define function with parameter n",
+            "Step 2: Handle base cases (n=0 returns 0, n=1 returns 1)",
+            "Step 3: Initialize first two numbers",
+            "Step 4: Loop from 2 to n, calculating next number",
+            "Step 5: Return the nth Fibonacci number"
+        ],
+        'code': '''def fibonacci(n):
+    """Calculate the nth Fibonacci number."""
+    if n <= 0:
+        return 0
+    elif n == 1:
+        return 1
+    
+    a, b = 0, 1
+    for _ in range(2, n + 1):
+        a, b = b, a + b
+    
+    return b
+
+# Test the function
+result = fibonacci(10)
+print(f"The 10th Fibonacci number is: {result}")'''
+    },
+    {
+        'id': 'prime',
+        'keywords': ['prime'],
+        'reasoning': [
+            "Need to check divisibility by numbers",
+            "Only need to check up to sqrt(n)",
+            "Handle edge cases: n < 2 returns False",
+            "Can optimize by checking 2 separately, then odd numbers"
+        ],
+        'plan': [
+            "Step 1: Define function with parameter n",
+            "Step 2: Handle edge cases (n < 2)",
+            "Step 3: Check if divisible by 2",
+            "Step 4: Check odd divisors up to sqrt(n)",
+            "Step 5: Return True if no divisors found"
+        ],
+        'code': '''def is_prime(n):
+    """Check if a number is prime."""
+    if n < 2:
+        return False
+    if n == 2:
+        return True
+    if n % 2 == 0:
+        return False
+    
+    # Check odd divisors up to sqrt(n)
+    for i in range(3, int(n ** 0.5) + 1, 2):
+        if n % i == 0:
+            return False
+    
+    return True
+
+# Test the function
+test_numbers = [2, 17, 20, 29, 100]
+for num in test_numbers:
+    print(f"{num} is prime: {is_prime(num)}")'''
+    },
+    {
+        'id': 'palindrome',
+        'keywords': ['palindrome'],
+        'reasoning': [
+            "Need to compare string with its reverse",
+            "Can ignore case and non-alphanumeric characters",
+            "Can use slicing or two-pointer approach",
+            "Edge case: empty string is a palindrome"
+        ],
+        'plan': [
+            "Step 1: Define function with string parameter",
+            "Step 2: Clean string (lowercase, remove non-alphanumeric)",
+            "Step 3: Compare string with reverse",
+            "Step 4: Return boolean result"
+        ],
+        'code': '''def is_palindrome(text):
+    """Check if a string is a palindrome."""
+    # Clean the string: lowercase and keep only alphanumeric
+    cleaned = ''.join(c.lower() for c in text if c.isalnum())
+    
+    # Compare with reverse
+    return cleaned == cleaned[::-1]
+
+# Test the function
+test_strings = ["racecar", "hello", "A man a plan a canal Panama", "12321"]
+for s in test_strings:
+    print(f"'{s}' is palindrome: {is_palindrome(s)}")'''
+    },
+    {
+        'id': 'sort',
+        'keywords': ['sort', 'bubble'],
+        'reasoning': [
+            "Need to implement sorting algorithm",
+            "Bubble sort compares adjacent elements",
+            "Time complexity: O(n²)",
+            "Need nested loops for comparison and swapping"
+        ],
+        'plan': [
+            "Step 1: Define function with list parameter",
+            "Step 2: Get length of list",
+            "Step 3: Outer loop for passes",
+            "Step 4: Inner loop for comparisons",
+            "Step 5: Swap if elements are out of order",
+            "Step 6: Return sorted list"
+        ],
+        'code': '''def bubble_sort(arr):
+    """Sort a list using bubble sort algorithm."""
+    n = len(arr)
+    arr = arr.copy()  # Don't modify original
+    
+    for i in range(n):
+        swapped = False
+        for j in range(0, n - i - 1):
+            if arr[j] > arr[j + 1]:
+                arr[j], arr[j + 1] = arr[j + 1], arr[j]
+                swapped = True
+        
+        # If no swaps, array is sorted
+        if not swapped:
+            break
+    
+    return arr
+
+# Test the function
+unsorted = [64, 34, 25, 12, 22, 11, 90]
+sorted_arr = bubble_sort(unsorted)
+print(f"Original: {unsorted}")
+print(f"Sorted: {sorted_arr}")'''
+    },
+    {
+        'id': 'factorial',
+        'keywords': ['factorial'],
+        'reasoning': [
+            "Factorial is the product of all positive integers up to n",
+            "Can be solved recursively or iteratively",
+            "Base case: 0! = 1, 1! = 1",
+            "Need to handle negative numbers (undefined)"
+        ],
+        'plan': [
+            "Step 1: Define function with parameter n",
+            "Step 2: Handle base case (n=0 or n=1 returns 1)",
+            "Step 3: Handle negative numbers (raise error)",
+            "Step 4: Initialize result variable",
+            "Step 5: Multiply result by each number from 2 to n",
+            "Step 6: Return final result"
+        ],
+        'code': '''def factorial(n):
+    """Calculate the factorial of n."""
+    if n < 0:
+        raise ValueError("Factorial is not defined for negative numbers")
+    if n == 0 or n == 1:
+        return 1
+    
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+    
+    return result
+
+# Test the function
+test_values = [0, 1, 5, 10]
+for val in test_values:
+    print(f"{val}! = {factorial(val)}")'''
+    }
+]
+
+# Used when no template keyword occurs in the task
+DEFAULT_TEMPLATE = {
+    'id': 'generic',
+    'keywords': [],
+    'reasoning': [
+        "Analyzing the problem structure",
+        "Identifying required data structures",
+        "Considering algorithmic complexity",
+        "Planning for error handling"
+    ],
+    'plan': [
+        "Step 1: Define function signature",
+        "Step 2: Initialize necessary variables",
+        "Step 3: Implement main logic",
+        "Step 4: Handle edge cases",
+        "Step 5: Return result"
+    ],
+    'code': '''def solve_task():
+    """
+    Generic function to solve the given task.
+    This is a placeholder - customize based on your specific needs.
+    """
+    result = "Task completed successfully!"
+    return result
+
+# Test the function
+output = solve_task()
+print(output)'''
+}
+
+class TaskClassifier:
+    """Route a task description to its template in a single pass.
+    
+    All template keywords are compiled into one Aho-Corasick automaton, so
+    classifying a task costs O(len(task)) however many templates exist.
+    Like the if/elif chain it replaces, matching is by case-insensitive
+    substring and the earliest template in the registry wins. Results are
+    cached per task string so every phase of a task shares one lookup.
+    """
+    
+    def __init__(self, templates: List[Dict], default: Dict, cache_size: int = 4096):
+        self.templates = templates
+        self.default = default
+        # Trie transitions, failure links and, per state, the best (lowest)
+        # template index matched at or via the failure chain of that state
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [len(templates)]
+        for priority, template in enumerate(templates):
+            for keyword in template['keywords']:
+                self._add(keyword.lower(), priority)
+        self._link()
+        self.classify = functools.lru_cache(maxsize=cache_size)(self._classify)
+    
+    def _add(self, keyword: str, priority: int):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(len(self.templates))
+            state = next_state
+        self._best[state] = min(self._best[state], priority)
+    
+    def _link(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._best[next_state] = min(self._best[next_state],
+                                             self._best[self._fail[next_state]])
+                pending.append(next_state)
+    
+    def _classify(self, task: str) -> Dict:
+        goto, fail, best = self._goto, self._fail, self._best
+        winner = len(self.templates)
+        state = 0
+        for char in task.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best[state] < winner:
+                winner = best[state]
+                if winner == 0:
+                    break
+        return self.templates[winner] if winner < len(self.templates) else self.default
+
+TASK_CLASSIFIER = TaskClassifier(TASK_TEMPLATES, DEFAULT_TEMPLATE)
+
+class PhaseEvent(NamedTuple):
+    """One step of progress streamed by ReACTCodeGenerator.iter_phases().
+    
+    ``kind`` is one of 'phase_start' (data: phase name), 'reasoning' (a
+    reasoning/plan line), 'code' (a line of generated code), 'stdout' (an
+    output chunk of the running snippet), 'error' (the execution error)
+    and 'phase_end' (data: seconds spent in the phase).
+    """
+    kind: str
+    phase: str
+    data: object
+
+class ReACTCodeGenerator:
+    def __init__(self, interactive: bool = True, pacing: Optional[bool] = None,
+                 executor=None, result_cache: Optional[ResultCache] = None):
+        # Headless (non-interactive) runs skip prompts, redraws and, unless
+        # asked otherwise, the pacing delays between phases
+        self.interactive = interactive
+        self.pacing = interactive if pacing is None else pacing
+        self.executor = executor or InProcessExecutor()
+        self.result_cache = result_cache
+        self.renderer = TerminalRenderer()
+        self.reset_task()
         
         self.phases = [
             {
@@ -52,9 +1063,35 @@ class ReACTCodeGenerator:
             }
         ]
     
+    def reset_task(self):
+        """Clear all per-task state so the generator can take a new task"""
+        self.current_phase = 0
+        self.task_description = ""
+        self.reasoning_log = []
+        self.generated_code = ""
+        self.execution_output = ""
+        self.execution_error = ""
+        self.execution_profile = None
+        self.phase_timings = {}
+    
+    def pause(self, seconds: float):
+        """Sleep between phases when pacing is enabled"""
+        if self.pacing:
+            time.sleep(seconds)
+    
+    def announce(self, message: str):
+        """Print a progress message in interactive mode"""
+        if self.interactive:
+            print(message)
+    
+    def wait_for_user(self, prompt: str):
+        """Block on Enter in interactive mode"""
+        if self.interactive:
+            input(prompt)
+    
     def clear_screen(self):
         """Clear the console screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        self.renderer.clear()
     
     def print_header(self):
         """Print the application header"""
@@ -131,18 +1168,20 @@ class ReACTCodeGenerator:
     
     def display_ui(self):
         """Display the complete UI"""
-        self.clear_screen()
-        self.print_header()
-        self.print_phases()
-        self.print_task()
-        self.print_reasoning()
-        self.print_code()
-        self.print_execution_results()
+        if not self.interactive:
+            return
+        with self.renderer.frame():
+            self.print_header()
+            self.print_phases()
+            self.print_task()
+            self.print_reasoning()
+            self.print_code()
+            self.print_execution_results()
     
     def phase_understand(self, task: str):
         """Phase 1: Understand the task"""
         self.task_description = task
-        time.sleep(0.5)
+        self.pause(0.5)
         
         # Reasoning for understanding
         reasoning = [
@@ -153,268 +1192,82 @@ class ReACTCodeGenerator:
         ]
         
         self.reasoning_log.extend(reasoning)
-        print("\n🤔 Understanding the task...")
-        time.sleep(1)
+        self.announce("\n🤔 Understanding the task...")
+        self.pause(1)
+    
+    def task_template(self) -> Dict:
+        """Return the registry template matching the current task"""
+        return TASK_CLASSIFIER.classify(self.task_description)
     
     def phase_reason(self):
         """Phase 2: Reason about the approach"""
-        print("\n💭 Reasoning about the approach...")
-        time.sleep(1)
+        self.announce("\n💭 Reasoning about the approach...")
+        self.pause(1)
         
         # Add reasoning based on task type
-        task_lower = self.task_description.lower()
-        
-        if 'fibonacci' in task_lower:
-            reasoning = [
-                "This is a sequence generation problem",
-                "Can be solved iteratively or recursively",
-                "Iterative approach is more efficient for large n",
-                "Need to handle base cases (n=0, n=1)"
-            ]
-        elif 'prime' in task_lower:
-            reasoning = [
-                "Need to check divisibility by numbers",
-                "Only need to check up to sqrt(n)",
-                "Handle edge cases: n < 2 returns False",
-                "Can optimize by checking 2 separately, then odd numbers"
-            ]
-        elif 'palindrome' in task_lower:
-            reasoning = [
-                "Need to compare string with its reverse",
-                "Can ignore case and non-alphanumeric characters",
-                "Can use slicing or two-pointer approach",
-                "Edge case: empty string is a palindrome"
-            ]
-        elif 'sort' in task_lower or 'bubble' in task_lower:
-            reasoning = [
-                "Need to implement sorting algorithm",
-                "Bubble sort compares adjacent elements",
-                "Time complexity: O(n²)",
-                "Need nested loops for comparison and swapping"
-            ]
-        elif 'factorial' in task_lower:
-            reasoning = [
-                "Factorial is the product of all positive integers up to n",
-                "Can be solved recursively or iteratively",
-                "Base case: 0! = 1, 1! = 1",
-                "Need to handle negative numbers (undefined)"
-            ]
-        else:
-            reasoning = [
-                "Analyzing the problem structure",
-                "Identifying required data structures",
-                "Considering algorithmic complexity",
-                "Planning for error handling"
-            ]
-        
-        self.reasoning_log.extend(reasoning)
+        self.reasoning_log.extend(self.task_template()['reasoning'])
     
     def phase_plan(self):
         """Phase 3: Create implementation plan"""
-        print("\n📋 Creating implementation plan...")
-        time.sleep(1)
-        
-        task_lower = self.task_description.lower()
-        
-        if 'fibonacci' in task_lower:
-            plan = [
-                "Step 1: Define function with parameter n",
-                "Step 2: Handle base cases (n=0 returns 0, n=1 returns 1)",
-                "Step 3: Initialize first two numbers",
-                "Step 4: Loop from 2 to n, calculating next number",
-                "Step 5: Return the nth Fibonacci number"
-            ]
-        elif 'prime' in task_lower:
-            plan = [
-                "Step 1: Define function with parameter n",
-                "Step 2: Handle edge cases (n < 2)",
-                "Step 3: Check if divisible by 2",
-                "Step 4: Check odd divisors up to sqrt(n)",
-                "Step 5: Return True if no divisors found"
-            ]
-        elif 'palindrome' in task_lower:
-            plan = [
-                "Step 1: Define function with string parameter",
-                "Step 2: Clean string (lowercase, remove non-alphanumeric)",
-                "Step 3: Compare string with reverse",
-                "Step 4: Return boolean result"
-            ]
-        elif 'sort' in task_lower or 'bubble' in task_lower:
-            plan = [
-                "Step 1: Define function with list parameter",
-                "Step 2: Get length of list",
-                "Step 3: Outer loop for passes",
-                "Step 4: Inner loop for comparisons",
-                "Step 5: Swap if elements are out of order",
-                "Step 6: Return sorted list"
-            ]
-        elif 'factorial' in task_lower:
-            plan = [
-                "Step 1: Define function with parameter n",
-                "Step 2: Handle base case (n=0 or n=1 returns 1)",
-                "Step 3: Handle negative numbers (raise error)",
-                "Step 4: Initialize result variable",
-                "Step 5: Multiply result by each number from 2 to n",
-                "Step 6: Return final result"
-            ]
-        else:
-            plan = [
-                "Step 1: Define function signature",
-                "Step 2: Initialize necessary variables",
-                "Step 3: Implement main logic",
-                "Step 4: Handle edge cases",
-                "Step 5: Return result"
-            ]
+        self.announce("\n📋 Creating implementation plan...")
+        self.pause(1)
         
-        self.reasoning_log.extend(plan)
+        self.reasoning_log.extend(self.task_template()['plan'])
     
     def phase_generate(self):
         """Phase 4: Generate the actual code"""
-        print("\n⚙️  Generating code...")
-        time.sleep(1)
-        
-        task_lower = self.task_description.lower()
-        
-        if 'fibonacci' in task_lower:
-            self.generated_code = '''def fibonacci(n):
-    """Calculate the nth Fibonacci number."""
-    if n <= 0:
-        return 0
-    elif n == 1:
-        return 1
-    
-    a, b = 0, 1
-    for _ in range(2, n + 1):
-        a, b = b, a + b
-    
-    return b
-
-# Test the function
-result = fibonacci(10)
-print(f"The 10th Fibonacci number is: {result}")'''
-        
-        elif 'prime' in task_lower:
-            self.generated_code = '''def is_prime(n):
-    """Check if a number is prime."""
-    if n < 2:
-        return False
-    if n == 2:
-        return True
-    if n % 2 == 0:
-        return False
-    
-    # Check odd divisors up to sqrt(n)
-    for i in range(3, int(n ** 0.5) + 1, 2):
-        if n % i == 0:
-            return False
-    
-    return True
-
-# Test the function
-test_numbers = [2, 17, 20, 29, 100]
-for num in test_numbers:
-    print(f"{num} is prime: {is_prime(num)}")'''
-        
-        elif 'palindrome' in task_lower:
-            self.generated_code = '''def is_palindrome(text):
-    """Check if a string is a palindrome."""
-    # Clean the string: lowercase and keep only alphanumeric
-    cleaned = ''.join(c.lower() for c in text if c.isalnum())
-    
-    # Compare with reverse
-    return cleaned == cleaned[::-1]
-
-# Test the function
-test_strings = ["racecar", "hello", "A man a plan a canal Panama", "12321"]
-for s in test_strings:
-    print(f"'{s}' is palindrome: {is_palindrome(s)}")'''
-        
-        elif 'sort' in task_lower or 'bubble' in task_lower:
-            self.generated_code = '''def bubble_sort(arr):
-    """Sort a list using bubble sort algorithm."""
-    n = len(arr)
-    arr = arr.copy()  # Don't modify original
-    
-    for i in range(n):
-        swapped = False
-        for j in range(0, n - i - 1):
-            if arr[j] > arr[j + 1]:
-                arr[j], arr[j + 1] = arr[j + 1], arr[j]
-                swapped = True
+        self.announce("\n⚙️  Generating code...")
+        self.pause(1)
         
-        # If no swaps, array is sorted
-        if not swapped:
-            break
+        self.generated_code = self.task_template()['code']
     
-    return arr
-
-# Test the function
-unsorted = [64, 34, 25, 12, 22, 11, 90]
-sorted_arr = bubble_sort(unsorted)
-print(f"Original: {unsorted}")
-print(f"Sorted: {sorted_arr}")'''
+    def phase_execute(self):
+        """Phase 5: Execute the generated code"""
+        self.announce("\n▶️  Executing code...")
+        self.pause(1)
         
-        elif 'factorial' in task_lower:
-            self.generated_code = '''def factorial(n):
-    """Calculate the factorial of n."""
-    if n < 0:
-        raise ValueError("Factorial is not defined for negative numbers")
-    if n == 0 or n == 1:
-        return 1
-    
-    result = 1
-    for i in range(2, n + 1):
-        result *= i
+        _drain(self.execute_code(stream=False))
     
-    return result
-
-# Test the function
-test_values = [0, 1, 5, 10]
-for val in test_values:
-    print(f"{val}! = {factorial(val)}")'''
-        
+    def execute_code(self, stream: bool = True) -> Generator[str, None, None]:
+        """Run the generated code and record its outcome, yielding stdout
+        chunks as the snippet produces them when ``stream`` is set"""
+        result = self.cached_result()
+        if result is not None:
+            if stream and result['output']:
+                yield result['output']
         else:
-            # Generic example code
-            self.generated_code = '''def solve_task():
-    """
-    Generic function to solve the given task.
-    This is a placeholder - customize based on your specific needs.
-    """
-    result = "Task completed successfully!"
-    return result
-
-# Test the function
-output = solve_task()
-print(output)'''
+            if stream:
+                result = yield from self.executor.stream(self.generated_code)
+            else:
+                result = self.executor.execute(self.generated_code)
+            if self.result_cache is not None:
+                self.result_cache.put(self.generated_code, result)
+        self.record_execution(result)
     
-    def phase_execute(self):
-        """Phase 5: Execute the generated code"""
-        print("\n▶️  Executing code...")
-        time.sleep(1)
+    def cached_result(self) -> Optional[Dict[str, str]]:
+        """Return a memoized result for the generated code, if any"""
+        if self.result_cache is None:
+            return None
+        result = self.result_cache.get(self.generated_code)
+        if result is not None:
+            self.reasoning_log.append("Result cache hit: skipped execution of unchanged code")
+        return result
+    
+    def record_execution(self, result: Dict[str, str]):
+        """Store an execution result on the task state"""
+        self.execution_output = result['output']
+        self.execution_profile = result.get('profile')
         
-        try:
-            # Capture stdout
-            old_stdout = sys.stdout
-            sys.stdout = captured_output = StringIO()
-            
-            # Execute the code
-            exec(self.generated_code)
-            
-            # Get the output
-            sys.stdout = old_stdout
-            self.execution_output = captured_output.getvalue()
-            
+        if result['status'] == 'ok':
             self.reasoning_log.append("Code executed successfully!")
-            
-        except Exception as e:
-            sys.stdout = old_stdout
-            self.execution_error = str(e)
-            self.reasoning_log.append(f"Execution failed: {str(e)}")
+        else:
+            self.execution_error = result['error']
+            self.reasoning_log.append(f"Execution failed: {result['error']}")
     
     def phase_reflect(self):
         """Phase 6: Reflect on the results"""
-        print("\n🔍 Reflecting on results...")
-        time.sleep(1)
+        self.announce("\n🔍 Reflecting on results...")
+        self.pause(1)
         
         if self.execution_error:
             reflections = [
@@ -433,45 +1286,168 @@ print(output)'''
         
         self.reasoning_log.extend(reflections)
     
+    def iter_phases(self, task: str) -> Iterator[PhaseEvent]:
+        """Run a fresh task through all phases, yielding events as they happen.
+        
+        Unlike process_task() nothing is drawn and nobody is prompted; output
+        of the running snippet is streamed chunk by chunk.
+        """
+        self.reset_task()
+        steps = [
+            (self.phase_understand, (task,)),
+            (self.phase_reason, ()),
+            (self.phase_plan, ()),
+            (self.phase_generate, ()),
+            (None, ()),
+            (self.phase_reflect, ())
+        ]
+        for index, (method, args) in enumerate(steps):
+            self.current_phase = index
+            phase = self.phases[index]
+            phase_id = phase['id']
+            yield PhaseEvent('phase_start', phase_id, phase['name'])
+            
+            logged = len(self.reasoning_log)
+            start = time.perf_counter()
+            if method is None:
+                # Phase 5 streams the snippet's output while it runs
+                self.announce("\n▶️  Executing code...")
+                self.pause(1)
+                for chunk in self.execute_code(stream=True):
+                    yield PhaseEvent('stdout', phase_id, chunk)
+            else:
+                method(*args)
+            elapsed = time.perf_counter() - start
+            self.phase_timings[phase_id] = elapsed
+            
+            for line in self.reasoning_log[logged:]:
+                yield PhaseEvent('reasoning', phase_id, line)
+            if phase_id == 'generate':
+                for line in self.generated_code.splitlines(True):
+                    yield PhaseEvent('code', phase_id, line)
+            if phase_id == 'execute' and self.execution_error:
+                yield PhaseEvent('error', phase_id, self.execution_error)
+            yield PhaseEvent('phase_end', phase_id, elapsed)
+        self.current_phase = len(self.phases)
+    
+    async def aiter_phases(self, task: str) -> AsyncIterator[PhaseEvent]:
+        """Async counterpart of iter_phases(); the phases run in a worker
+        thread so the event loop is never blocked.
+        
+        A consumer that stops early (``break``, ``aclose()`` or cancellation)
+        stops the producer at its next event and waits for it to finish, so
+        the generator is free for the next task once this returns.
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        finished = object()
+        stop = threading.Event()
+        
+        def produce():
+            phases = self.iter_phases(task)
+            try:
+                for event in phases:
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            finally:
+                # Closing the generator abandons a streaming snippet; the
+                # subprocess executor kills the worker running it
+                phases.close()
+                if not stop.is_set():
+                    loop.call_soon_threadsafe(events.put_nowait, finished)
+        
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                event = await events.get()
+                if event is finished:
+                    break
+                yield event
+        finally:
+            stop.set()
+            await producer
+    
+    def run_phase(self, method, *args):
+        """Call one phase method and record how long it took"""
+        phase_id = self.phases[self.current_phase]['id']
+        start = time.perf_counter()
+        method(*args)
+        self.phase_timings[phase_id] = time.perf_counter() - start
+    
     def process_task(self, task: str):
         """Process a coding task through all ReACT phases"""
+        # Start every task from a full redraw; the previous cycle's summary
+        # and prompt may have scrolled the screen
+        self.renderer.invalidate()
+        
         # Phase 1: Understand
         self.current_phase = 0
         self.display_ui()
-        self.phase_understand(task)
-        input("\nPress Enter to continue to Reasoning phase...")
+        self.run_phase(self.phase_understand, task)
+        self.wait_for_user("\nPress Enter to continue to Reasoning phase...")
         
         # Phase 2: Reason
         self.current_phase = 1
         self.display_ui()
-        self.phase_reason()
-        input("\nPress Enter to continue to Planning phase...")
+        self.run_phase(self.phase_reason)
+        self.wait_for_user("\nPress Enter to continue to Planning phase...")
         
         # Phase 3: Plan
         self.current_phase = 2
         self.display_ui()
-        self.phase_plan()
-        input("\nPress Enter to continue to Code Generation...")
+        self.run_phase(self.phase_plan)
+        self.wait_for_user("\nPress Enter to continue to Code Generation...")
         
         # Phase 4: Generate
         self.current_phase = 3
         self.display_ui()
-        self.phase_generate()
-        input("\nPress Enter to execute the code...")
+        self.run_phase(self.phase_generate)
+        self.wait_for_user("\nPress Enter to execute the code...")
         
         # Phase 5: Execute
         self.current_phase = 4
         self.display_ui()
-        self.phase_execute()
-        input("\nPress Enter to see reflection...")
+        self.run_phase(self.phase_execute)
+        self.wait_for_user("\nPress Enter to see reflection...")
         
         # Phase 6: Reflect
         self.current_phase = 5
         self.display_ui()
-        self.phase_reflect()
+        self.run_phase(self.phase_reflect)
         self.current_phase = 6
         self.display_ui()
     
+    def result(self) -> Dict:
+        """Return the structured outcome of the last processed task"""
+        record = {
+            'task': self.task_description,
+            'reasoning_log': self.reasoning_log,
+            'code': self.generated_code,
+            'stdout': self.execution_output,
+            'error': self.execution_error,
+            'timings': self.phase_timings
+        }
+        if self.execution_profile:
+            record['profile'] = self.execution_profile
+        return record
+    
+    def run_batch(self, tasks: Iterable[str], out: TextIO,
+                  metrics: Optional[PhaseMetrics] = None) -> int:
+        """Run every task through all phases and write one JSON line per task"""
+        count = 0
+        for task in tasks:
+            self.reset_task()
+            self.process_task(task)
+            record = self.result()
+            record['index'] = count
+            if metrics is not None:
+                metrics.record(record)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+        out.flush()
+        return count
+    
     def run(self):
         """Main application loop"""
         self.clear_screen()
@@ -500,7 +1476,7 @@ print(output)'''
                 break
             
             if task.lower() == 'reset':
-                self.__init__()
+                self.reset_task()
                 continue
             
             # Process the task through all phases
@@ -512,8 +1488,393 @@ print(output)'''
             print("  • Type 'reset' to clear everything")
             print("  • Type 'quit' to exit")
 
+class AsyncReACTCodeGenerator:
+    """Drive many ReACT tasks concurrently from a single asyncio event loop.
+    
+    Phases are coroutines: pacing delays are awaited instead of slept and
+    snippets run through the executor's ``execute_async`` so the loop is
+    never blocked. Every task keeps its state in its own headless
+    ReACTCodeGenerator. A semaphore caps the tasks in flight and a second
+    one keeps executions within the executor's worker count. With the
+    default SubprocessExecutor, cancelling a task kills its running snippet.
+    """
+    
+    def __init__(self, executor=None, concurrency: int = 100, pacing: bool = False,
+                 result_cache: Optional[ResultCache] = None):
+        self.owns_executor = executor is None
+        self.executor = executor or SubprocessExecutor(workers=os.cpu_count() or 1)
+        if isinstance(self.executor, InProcessExecutor) and self.executor.profile and concurrency > 1:
+            # tracemalloc is process-wide, so parallel runs would measure each other
+            raise ValueError("profiling needs a subprocess executor or a concurrency of 1")
+        self.concurrency = max(1, concurrency)
+        self.pacing = pacing
+        self.result_cache = result_cache
+        self._task_slots = asyncio.Semaphore(self.concurrency)
+        self._exec_slots = asyncio.Semaphore(getattr(self.executor, 'workers', self.concurrency))
+    
+    async def pause(self, seconds: float):
+        """Await the pacing delay between phases when enabled"""
+        if self.pacing:
+            await asyncio.sleep(seconds)
+    
+    async def phase_understand(self, state: ReACTCodeGenerator, task: str):
+        await self.pause(1.5)
+        state.phase_understand(task)
+    
+    async def phase_reason(self, state: ReACTCodeGenerator):
+        await self.pause(1)
+        state.phase_reason()
+    
+    async def phase_plan(self, state: ReACTCodeGenerator):
+        await self.pause(1)
+        state.phase_plan()
+    
+    async def phase_generate(self, state: ReACTCodeGenerator):
+        await self.pause(1)
+        state.phase_generate()
+    
+    async def phase_execute(self, state: ReACTCodeGenerator):
+        await self.pause(1)
+        result = state.cached_result()
+        if result is None:
+            async with self._exec_slots:
+                result = await self.executor.execute_async(state.generated_code)
+            if self.result_cache is not None:
+                self.result_cache.put(state.generated_code, result)
+        state.record_execution(result)
+    
+    async def phase_reflect(self, state: ReACTCodeGenerator):
+        await self.pause(1)
+        state.phase_reflect()
+    
+    async def process_task(self, task: str) -> Dict:
+        """Run one task through all phases and return its result"""
+        async with self._task_slots:
+            state = ReACTCodeGenerator(interactive=False, pacing=False,
+                                       executor=self.executor, result_cache=self.result_cache)
+            steps = [
+                (self.phase_understand, (state, task)),
+                (self.phase_reason, (state,)),
+                (self.phase_plan, (state,)),
+                (self.phase_generate, (state,)),
+                (self.phase_execute, (state,)),
+                (self.phase_reflect, (state,))
+            ]
+            for index, (coroutine, args) in enumerate(steps):
+                state.current_phase = index
+                start = time.perf_counter()
+                await coroutine(*args)
+                state.phase_timings[state.phases[index]['id']] = time.perf_counter() - start
+            state.current_phase = len(state.phases)
+            return state.result()
+    
+    async def run_many(self, tasks: Iterable[str]) -> AsyncIterator[Dict]:
+        """Yield results as tasks finish, keeping at most ``concurrency`` in flight"""
+        pending = set()
+        for index, task in enumerate(tasks):
+            if len(pending) >= self.concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    yield finished.result()
+            pending.add(asyncio.ensure_future(self._indexed(index, task)))
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    yield finished.result()
+        finally:
+            for unfinished in pending:
+                unfinished.cancel()
+    
+    async def _indexed(self, index: int, task: str) -> Dict:
+        record = await self.process_task(task)
+        record['index'] = index
+        return record
+    
+    def close(self):
+        """Shut down the executor if this engine created it"""
+        if self.owns_executor:
+            self.executor.close()
+
+# Each pool worker keeps one headless generator and resets it between tasks,
+# so per-task state never crosses task (or process) boundaries
+_worker_generator = None
+
+def _init_worker(pacing: bool, executor_options: Dict,
+                 result_cache_options: Optional[Dict]):
+    """Create the per-process generator used by _process_chunk"""
+    global _worker_generator
+    result_cache = ResultCache(**result_cache_options) if result_cache_options else None
+    _worker_generator = ReACTCodeGenerator(interactive=False, pacing=pacing,
+                                           executor=make_executor(**executor_options),
+                                           result_cache=result_cache)
+
+def _process_chunk(start: int, tasks: List[str]) -> List[Dict]:
+    """Run a chunk of tasks inside a pool worker"""
+    results = []
+    for offset, task in enumerate(tasks):
+        _worker_generator.reset_task()
+        _worker_generator.process_task(task)
+        record = _worker_generator.result()
+        record['index'] = start + offset
+        results.append(record)
+    return results
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[Tuple[int, List[str]]]:
+    """Lazily group items into (start index, chunk) pairs"""
+    iterator = iter(items)
+    start = 0
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+class TaskScheduler:
+    """Spread ReACT tasks over a process pool and stream the results back.
+    
+    Tasks are pulled from the input lazily in chunks and at most
+    ``max_pending`` chunks are in flight at once, so the input is never
+    fully materialized in memory no matter how large it is.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 64,
+                 max_pending: Optional[int] = None, ordered: bool = True,
+                 pacing: bool = False, executor_options: Optional[Dict] = None,
+                 result_cache_options: Optional[Dict] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.max_pending = max_pending or self.workers * 2
+        self.ordered = ordered
+        self.pacing = pacing
+        self.executor_options = executor_options or {}
+        self.result_cache_options = result_cache_options
+    
+    def map(self, tasks: Iterable[str]) -> Iterator[Dict]:
+        """Yield one result per task, in input order unless ``ordered`` is False"""
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.pacing, self.executor_options,
+                                           self.result_cache_options)) as pool:
+            if self.ordered:
+                pending = deque()
+                for start, chunk in _chunked(tasks, self.chunk_size):
+                    if len(pending) >= self.max_pending:
+                        yield from pending.popleft().result()
+                    pending.append(pool.submit(_process_chunk, start, chunk))
+                while pending:
+                    yield from pending.popleft().result()
+            else:
+                pending = set()
+                for start, chunk in _chunked(tasks, self.chunk_size):
+                    if len(pending) >= self.max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from future.result()
+                    pending.add(pool.submit(_process_chunk, start, chunk))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+
+def read_tasks(source: TextIO) -> Iterator[str]:
+    """Yield non-empty task descriptions, one per line"""
+    for line in source:
+        task = line.strip()
+        if task:
+            yield task
+
+def open_stream(path: str, mode: str) -> TextIO:
+    """Open a file, treating '-' as stdin/stdout"""
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    return open(path, mode, encoding='utf-8')
+
+def claim_stdout() -> TextIO:
+    """Reserve the real stdout for JSONL results.
+    
+    Results go to a duplicate of file descriptor 1, and descriptor 1 itself
+    is pointed at stderr. Whatever a snippet writes through ``sys.stdout``,
+    ``sys.__stdout__`` or ``os.write(1, ...)`` then ends up on stderr instead
+    of in the middle of a JSON line.
+    """
+    sys.stdout.flush()
+    results = os.dup(1)
+    os.dup2(2, 1)
+    return os.fdopen(results, 'w', encoding='utf-8')
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="ReACT pattern code generator")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="run tasks from FILE ('-' for stdin), one per line, without prompts")
+    parser.add_argument('--output', '-o', metavar='FILE', default='-',
+                        help="where to write JSONL results in batch mode (default: stdout)")
+    parser.add_argument('--pace', action='store_true',
+                        help="keep the pacing delays between phases in batch mode")
+    parser.add_argument('--events', action='store_true',
+                        help="stream one JSON line per phase event instead of one per task")
+    parser.add_argument('--workers', '-j', type=int, default=1, metavar='N',
+                        help="number of worker processes in batch mode (0 = one per CPU)")
+    parser.add_argument('--chunk-size', type=int, default=64, metavar='N',
+                        help="tasks sent to a worker at a time")
+    parser.add_argument('--unordered', action='store_true',
+                        help="write results as soon as they finish instead of in input order")
+    parser.add_argument('--concurrency', type=int, metavar='N',
+                        help="drive up to N tasks at once from one asyncio event loop "
+                             "(results are written as they finish)")
+    parser.add_argument('--executor', choices=['inprocess', 'subprocess'], default='inprocess',
+                        help="run snippets in this interpreter or in sandboxed worker processes")
+    parser.add_argument('--timeout', type=float, default=5.0, metavar='SECONDS',
+                        help="wall-clock limit per snippet (subprocess executor)")
+    parser.add_argument('--cpu-limit', type=float, metavar='SECONDS',
+                        help="CPU time limit per snippet (subprocess executor)")
+    parser.add_argument('--memory-limit', type=int, default=256, metavar='MB',
+                        help="address space limit per worker (subprocess executor)")
+    parser.add_argument('--max-output', type=int, default=64 * 1024, metavar='CHARS',
+                        help="truncate snippet output beyond this many characters")
+    parser.add_argument('--code-cache-size', type=int, default=256, metavar='N',
+                        help="compiled snippets kept in memory (0 disables the cache)")
+    parser.add_argument('--code-cache-dir', metavar='DIR',
+                        help="also keep compiled snippets on disk across runs")
+    parser.add_argument('--result-cache', action='store_true',
+                        help="reuse results of previously executed identical snippets")
+    parser.add_argument('--result-cache-file', metavar='FILE',
+                        help="SQLite file backing the result cache (implies --result-cache)")
+    parser.add_argument('--result-cache-size', type=int, default=1024, metavar='N',
+                        help="maximum number of cached results")
+    parser.add_argument('--result-cache-ttl', type=float, metavar='SECONDS',
+                        help="expire cached results after this many seconds")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="write per-phase timing histograms to FILE ('-' for stderr)")
+    parser.add_argument('--metrics-format', choices=['json', 'prometheus'], default='json',
+                        help="format of the --metrics dump")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile executed snippets with cProfile and tracemalloc")
+    args = parser.parse_args(argv)
+    check_args(parser, args)
+    return args
+
+def check_args(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Reject option combinations that cannot work together"""
+    if args.profile and args.concurrency and args.concurrency > 1 and args.executor == 'inprocess':
+        parser.error("--profile with --concurrency needs --executor subprocess: "
+                     "tracemalloc is process-wide, so parallel in-process snippets "
+                     "would measure each other")
+
+def executor_options(args: argparse.Namespace, workers: int = 1) -> Dict:
+    """Translate command line options into make_executor() arguments;
+    ``workers`` sandboxes are used by a subprocess executor"""
+    options = {'kind': args.executor, 'max_output': args.max_output,
+               'cache_size': args.code_cache_size, 'cache_dir': args.code_cache_dir,
+               'profile': args.profile}
+    if args.executor == 'subprocess':
+        options.update(workers=workers, timeout=args.timeout, cpu_seconds=args.cpu_limit,
+                       memory_mb=args.memory_limit)
+    return options
+
+def result_cache_options(args: argparse.Namespace) -> Optional[Dict]:
+    """Translate command line options into ResultCache() arguments"""
+    if not (args.result_cache or args.result_cache_file):
+        return None
+    return {'maxsize': args.result_cache_size, 'ttl': args.result_cache_ttl,
+            'path': args.result_cache_file}
+
+async def run_batch_async(args: argparse.Namespace, tasks: Iterable[str], out: TextIO,
+                          metrics: PhaseMetrics) -> int:
+    """Run tasks on AsyncReACTCodeGenerator and write results as they finish"""
+    # One sandbox per task in flight, so snippets run in parallel rather than in turn
+    executor = make_executor(**executor_options(args, args.concurrency))
+    cache_options = result_cache_options(args)
+    result_cache = ResultCache(**cache_options) if cache_options else None
+    engine = AsyncReACTCodeGenerator(executor=executor, concurrency=args.concurrency,
+                                     pacing=args.pace, result_cache=result_cache)
+    count = 0
+    try:
+        async for record in engine.run_many(tasks):
+            metrics.record(record)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+        out.flush()
+    finally:
+        executor.close()
+        if result_cache is not None:
+            result_cache.close()
+    return count
+
+def run_batch(args: argparse.Namespace):
+    """Headless entry point: tasks in, JSONL results out"""
+    source = open_stream(args.batch, 'r')
+    out = claim_stdout() if args.output == '-' else open_stream(args.output, 'w')
+    metrics = PhaseMetrics()
+    try:
+        start = time.perf_counter()
+        if args.concurrency:
+            count = asyncio.run(run_batch_async(args, read_tasks(source), out, metrics))
+        elif args.events:
+            executor = make_executor(**executor_options(args))
+            try:
+                generator = ReACTCodeGenerator(interactive=False, pacing=args.pace,
+                                               executor=executor)
+                count = 0
+                for task in read_tasks(source):
+                    for event in generator.iter_phases(task):
+                        out.write(json.dumps({'index': count, **event._asdict()},
+                                             ensure_ascii=False) + "\n")
+                        out.flush()
+                    metrics.record(generator.result())
+                    count += 1
+            finally:
+                executor.close()
+        elif args.workers == 1:
+            executor = make_executor(**executor_options(args))
+            cache_options = result_cache_options(args)
+            result_cache = ResultCache(**cache_options) if cache_options else None
+            try:
+                generator = ReACTCodeGenerator(interactive=False, pacing=args.pace,
+                                               executor=executor, result_cache=result_cache)
+                count = generator.run_batch(read_tasks(source), out, metrics)
+                print(f"Code cache: {json.dumps(executor.stats())}", file=sys.stderr)
+                if result_cache is not None:
+                    print(f"Result cache: {json.dumps(result_cache.stats())}", file=sys.stderr)
+            finally:
+                executor.close()
+                if result_cache is not None:
+                    result_cache.close()
+        else:
+            scheduler = TaskScheduler(workers=args.workers or None, chunk_size=args.chunk_size,
+                                      ordered=not args.unordered, pacing=args.pace,
+                                      executor_options=executor_options(args),
+                                      result_cache_options=result_cache_options(args))
+            count = 0
+            for record in scheduler.map(read_tasks(source)):
+                metrics.record(record)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+            out.flush()
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed * 60 if elapsed > 0 else 0.0
+        print(f"Processed {count} tasks in {elapsed:.2f}s ({rate:.0f} tasks/min)", file=sys.stderr)
+        if args.metrics:
+            dump = metrics.to_prometheus() if args.metrics_format == 'prometheus' else metrics.to_json() + "\n"
+            if args.metrics == '-':
+                sys.stderr.write(dump)
+            else:
+                with open(args.metrics, 'w', encoding='utf-8') as f:
+                    f.write(dump)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
 def main():
     """Entry point"""
+    args = parse_args()
+    if args.batch:
+        run_batch(args)
+        return
+    
     try:
         generator = ReACTCodeGenerator()
         generator.run()
@@ -1,55 +1,902 @@
+import gc
 import os
+import re
+import sys
+import mmap
+import bisect
+import pickle
+import select
+import socket
+import hashlib
+import inspect
+import marshal
+import multiprocessing
+import random
 import time
-from typing import Dict, List
+import queue
+import struct
+import sqlite3
+import string
+import tempfile
+import itertools
+import threading
+import json
+import asyncio
+import argparse
+import tracemalloc
+from array import array
+from collections import deque
+from enum import IntEnum
+from itertools import islice
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple, Union
+from urllib.parse import unquote, urlsplit
 
-class CustomerSupportAI:
-    def __init__(self):
-        self.current_step = 0
-        self.chat_history = []
-        self.collected_data = {
-            'issue': '',
-            'category': '',
-            'urgency': '',
-            'details': '',
-            'solution': ''
-        }
+try:
+    import numpy as np
+except ImportError:  # Batch classification falls back to pure Python
+    np = None
+
+from terminal_renderer import TerminalRenderer
+
+# Keywords and synonyms per category; a term may be a phrase, and a mapping
+# gives per-term weights. Earlier categories win ties, and the first one is
+# the fallback when nothing matches.
+CATEGORY_KEYWORDS: Dict[str, Union[List[str], Dict[str, float]]] = {
+    'Technical': {
+        'technical': 2.0, 'tech': 1.0, 'error': 1.0, 'errors': 1.0, 'bug': 1.0, 'crash': 1.0,
+        'crashes': 1.0, 'crashing': 1.0, 'broken': 1.0, 'not working': 1.5, 'slow': 0.5,
+        'outage': 1.0, 'down': 0.5, 'connection': 1.0, 'internet': 1.0, 'wifi': 1.0,
+        'install': 1.0, 'update': 0.5, 'app': 0.5, 'freezes': 1.0, 'timeout': 1.0
+    },
+    'Billing': {
+        'billing': 2.0, 'bill': 1.5, 'invoice': 1.5, 'charge': 1.0, 'charged': 1.5,
+        'refund': 1.5, 'payment': 1.5, 'paid': 1.0, 'pay': 1.0, 'price': 1.0,
+        'subscription': 1.0, 'credit card': 1.5, 'overcharged': 2.0, 'double charged': 2.0,
+        'receipt': 1.0, 'fee': 1.0
+    },
+    'Account': {
+        'account': 2.0, 'accounts': 2.0, 'login': 1.5, 'log in': 1.5, 'sign in': 1.5,
+        'password': 1.5, 'username': 1.0, 'email': 0.5, 'locked': 1.0, 'locked out': 2.0,
+        'profile': 1.0, 'two factor': 1.5, '2fa': 1.5, 'verify': 0.5, 'delete my': 1.0
+    },
+    'General': {
+        'general': 2.0, 'question': 1.0, 'information': 1.0, 'info': 1.0, 'hours': 1.0,
+        'feedback': 1.0, 'suggestion': 1.0, 'how do i': 0.5
+    }
+}
+
+class CategoryIndex:
+    """Scored keyword classifier for the Categorize step.
+    
+    The keyword table is compiled into one hash map from token n-grams
+    (single words and short phrases) to ``(category, weight)`` pairs, so a
+    message is classified in a single pass over its tokens, regardless of
+    how many keywords exist. The highest total score wins; ties go to the
+    earlier category and a message with no hits gets ``default``.
+    """
+    
+    TOKEN = re.compile(r"[a-z0-9']+")
+    
+    def __init__(self, table: Mapping[str, Union[List[str], Mapping[str, float]]] = CATEGORY_KEYWORDS,
+                 default: Optional[str] = None):
+        self.categories = tuple(table)
+        if not self.categories:
+            raise ValueError("keyword table is empty")
+        self.default = default or self.categories[0]
+        self.terms: Dict[Tuple[str, ...], List[Tuple[int, float]]] = {}
+        self.longest = 1
+        for category, keywords in enumerate(table.values()):
+            weights = keywords if isinstance(keywords, Mapping) else dict.fromkeys(keywords, 1.0)
+            for keyword, weight in weights.items():
+                gram = tuple(self.TOKEN.findall(keyword.lower()))
+                if gram:
+                    self.terms.setdefault(gram, []).append((category, float(weight)))
+                    self.longest = max(self.longest, len(gram))
+        # Batch tables (numpy): term ids, n-gram keys and weights, built on first use
+        self._batch = None
+    
+    def hits(self, text: str) -> Iterator[Tuple[str, ...]]:
+        """Yield every known term occurring in ``text``"""
+        tokens = self.TOKEN.findall(text.lower())
+        terms, longest = self.terms, self.longest
+        for i in range(len(tokens)):
+            for n in range(1, min(longest, len(tokens) - i) + 1):
+                gram = tuple(tokens[i:i + n])
+                if gram in terms:
+                    yield gram
+    
+    def scores(self, text: str) -> List[float]:
+        """Score of every category, in table order"""
+        totals = [0.0] * len(self.categories)
+        for gram in self.hits(text):
+            for category, weight in self.terms[gram]:
+                totals[category] += weight
+        return totals
+    
+    def _pick(self, totals) -> Tuple[str, float]:
+        best = max(range(len(totals)), key=lambda i: (totals[i], -i))
+        if totals[best] <= 0:
+            return self.default, 0.0
+        return self.categories[best], float(totals[best])
+    
+    def classify(self, text: str) -> Tuple[str, float]:
+        """Return ``(category, score)`` for one message"""
+        return self._pick(self.scores(text))
+    
+    def _batch_tables(self):
+        """Vocabulary of keyword tokens, sorted n-gram keys per length with
+        their term columns, and the term/category weight matrix"""
+        vocabulary: Dict[str, int] = {}
+        for gram in self.terms:
+            for token in gram:
+                vocabulary.setdefault(token, len(vocabulary))
+        base = len(vocabulary)
+        if base ** self.longest >= 2 ** 63:
+            # N-gram keys would overflow int64; score messages one by one instead
+            return False
+        weights = np.zeros((len(self.terms), len(self.categories)))
+        grams: Dict[int, Tuple[List[int], List[int]]] = {}
+        for column, (gram, pairs) in enumerate(self.terms.items()):
+            for category, weight in pairs:
+                weights[column, category] += weight
+            key = 0
+            for token in gram:
+                key = key * base + vocabulary[token]
+            keys, columns = grams.setdefault(len(gram), ([], []))
+            keys.append(key)
+            columns.append(column)
+        lookup = {}
+        for n, (keys, columns) in grams.items():
+            keys, columns = np.asarray(keys, dtype=np.int64), np.asarray(columns, dtype=np.intp)
+            order = np.argsort(keys)
+            lookup[n] = (keys[order], columns[order])
+        return vocabulary, base, lookup, weights
+    
+    def classify_batch(self, texts: Iterable[str]) -> List[Tuple[str, float]]:
+        """Classify a whole backlog at once.
         
-        self.steps = [
-            {
-                'id': 'greeting',
-                'name': 'Greeting',
-                'prompt': 'Greet the customer and ask what issue they need help with.',
-                'system_prompt': 'You are a friendly customer support agent. Greet the customer warmly and ask them to describe their issue briefly.'
-            },
-            {
-                'id': 'categorize',
-                'name': 'Categorize',
-                'prompt': 'Categorize the issue into: Technical, Billing, Account, or General.',
-                'system_prompt': "Based on the customer's issue, categorize it as Technical, Billing, Account, or General. Confirm the category with the customer."
-            },
-            {
-                'id': 'urgency',
-                'name': 'Urgency',
-                'prompt': 'Determine urgency level: Low, Medium, or High.',
-                'system_prompt': 'Ask clarifying questions to determine if this is Low (can wait), Medium (needs attention soon), or High (urgent) priority.'
-            },
-            {
-                'id': 'details',
-                'name': 'Details',
-                'prompt': 'Gather detailed information about the problem.',
-                'system_prompt': 'Ask specific questions to gather all necessary details to resolve the issue effectively.'
-            },
-            {
-                'id': 'solution',
-                'name': 'Solution',
-                'prompt': 'Provide a solution or next steps.',
-                'system_prompt': 'Based on all the information gathered, provide a clear solution or escalation path. Confirm the customer is satisfied.'
-            }
-        ]
+        With numpy the backlog is tokenized into one flat array of keyword
+        token ids (-1 for any other word) with the message row of each
+        token. N-grams of every length are encoded as integers and matched
+        against the sorted term keys with one ``searchsorted`` per length,
+        and the hits are summed per message and category with ``bincount``.
+        Memory is proportional to the number of tokens; nothing of size
+        messages x terms is built. Without numpy each message is scored in
+        turn.
+        """
+        texts = list(texts)
+        if np is not None and texts and self._batch is None:
+            self._batch = self._batch_tables()
+        if not self._batch:
+            return [self.classify(text) for text in texts]
+        vocabulary, base, lookup, weights = self._batch
+        token_lists = list(map(self.TOKEN.findall, map(str.lower, texts)))
+        tokens = list(itertools.chain.from_iterable(token_lists))
+        ids = np.fromiter(map(vocabulary.get, tokens, itertools.repeat(-1)),
+                          dtype=np.int64, count=len(tokens))
+        rows = np.repeat(np.arange(len(texts)), np.fromiter(map(len, token_lists), dtype=np.intp,
+                                                            count=len(texts)))
+        
+        hit_rows, hit_columns = [], []
+        for n, (term_keys, term_columns) in lookup.items():
+            starts = len(ids) - n + 1
+            if starts <= 0:
+                continue
+            keys = np.zeros(starts, dtype=np.int64)
+            valid = rows[:starts] == rows[n - 1:]
+            for offset in range(n):
+                part = ids[offset:offset + starts]
+                valid &= part >= 0
+                keys = keys * base + part
+            at = np.flatnonzero(valid)
+            found = np.searchsorted(term_keys, keys[at])
+            found[found == len(term_keys)] = 0
+            matched = term_keys[found] == keys[at]
+            hit_rows.append(rows[at[matched]])
+            hit_columns.append(term_columns[found[matched]])
+        hit_rows = np.concatenate(hit_rows) if hit_rows else np.zeros(0, dtype=np.intp)
+        hit_columns = np.concatenate(hit_columns) if hit_columns else np.zeros(0, dtype=np.intp)
+        
+        hit_weights = weights[hit_columns]
+        totals = np.column_stack([np.bincount(hit_rows, weights=hit_weights[:, category],
+                                              minlength=len(texts))
+                                  for category in range(len(self.categories))])
+        # argmax keeps the earliest category on ties, like _pick
+        best = totals.argmax(axis=1)
+        top = totals[np.arange(len(texts)), best]
+        categories, default = self.categories, self.default
+        return [(categories[b], s) if s > 0 else (default, 0.0)
+                for b, s in zip(best.tolist(), top.tolist())]
+
+CATEGORY_INDEX = CategoryIndex()
+
+URGENCY_KEYWORDS = {
+    'High': ('high', 'urgent', 'asap', 'immediately', 'critical', 'emergency', 'completely', "can't use"),
+    'Low': ('low', 'wait', 'whenever', 'no rush', 'not urgent', 'minor')
+}
+
+def classify_urgency(text: str) -> str:
+    """Map a free-text urgency answer to Low, Medium or High"""
+    text = text.lower()
+    # Check Low first so "not urgent" is not read as urgent
+    for level in ('Low', 'High'):
+        if any(keyword in text for keyword in URGENCY_KEYWORDS[level]):
+            return level
+    return 'Medium'
+
+class TicketStore:
+    """Persistent support tickets in a local SQLite (WAL) database.
+    
+    Ticket ids are allocated in-process from the highest stored id, so they
+    are monotonic and never collide for a single writer; shard workers
+    sharing a database interleave ids with ``stride``/``offset``. ``save`` only
+    queues the row; a writer thread drains the queue and commits everything
+    waiting in one transaction, so writes from many sessions share a commit.
+    Saving an existing id replaces the ticket. Queued tickets are visible to
+    ``get`` immediately; ``find`` flushes first. Lookups by id are on the
+    primary key and by category/urgency/status through secondary indexes.
+    A failed commit drops its batch and is raised by the next ``save``,
+    ``flush`` or ``find``; the writer carries on with later tickets.
+    """
+    
+    COLUMNS = ('id', 'session', 'status', 'category', 'urgency',
+               'issue', 'details', 'solution', 'created')
+    
+    def __init__(self, path: str, batch_size: int = 1024, stride: int = 1, offset: int = 0):
+        self.path = path
+        self.batch_size = batch_size
+        # Several processes sharing one database each take every ``stride``-th id
+        self.stride = stride
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tickets ("
+            "id INTEGER PRIMARY KEY, session TEXT, status TEXT NOT NULL, "
+            "category TEXT, urgency TEXT, issue TEXT, details TEXT, solution TEXT, "
+            "created REAL NOT NULL)"
+        )
+        for column in ('category', 'urgency', 'status'):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS tickets_{column} ON tickets({column})")
+        self._db.commit()
+        self._next_id = (self._db.execute("SELECT MAX(id) FROM tickets").fetchone()[0] or 999) + 1
+        self._next_id += (offset - self._next_id) % stride
+        self._pending: Dict[int, Tuple] = {}
+        self._queue = queue.Queue()
+        self.commits = 0
+        # Set by the writer when a batch fails to commit, until reported
+        self._error: Optional[Exception] = None
+        self._writer = threading.Thread(target=self._write_loop, name="ticket-writer", daemon=True)
+        self._writer.start()
+    
+    def allocate(self) -> int:
+        """Reserve the next ticket id"""
+        with self._lock:
+            ticket_id = self._next_id
+            self._next_id += self.stride
+        return ticket_id
+    
+    def save(self, ticket_id: int, data: Mapping[str, str], session: Optional[str] = None,
+             status: str = 'open') -> int:
+        """Queue a ticket for writing; returns its id"""
+        self._raise_error()
+        row = (ticket_id, session, status, data.get('category'), data.get('urgency'),
+               data.get('issue'), data.get('details'), data.get('solution'), time.time())
+        with self._lock:
+            self._pending[ticket_id] = row
+        self._queue.put(row)
+        return ticket_id
+    
+    def _write_loop(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    with db:
+                        db.executemany(f"INSERT OR REPLACE INTO tickets VALUES ({', '.join('?' * len(self.COLUMNS))})", rows)
+                    self.commits += 1
+            except Exception as e:
+                # Dying here would leave flush() waiting forever
+                self._error = e
+            finally:
+                with self._lock:
+                    for row in rows:
+                        if self._pending.get(row[0]) is row:
+                            del self._pending[row[0]]
+                for _ in batch:
+                    self._queue.task_done()
+            if len(rows) < len(batch):
+                break
+        db.close()
+    
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+    
+    def flush(self):
+        """Wait until every queued ticket is committed"""
+        self._queue.join()
+        self._raise_error()
+    
+    def get(self, ticket_id: int) -> Optional[Dict]:
+        """Return one ticket by id, or None"""
+        with self._lock:
+            row = self._pending.get(ticket_id)
+            if row is None:
+                row = self._db.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row is not None else None
+    
+    def find(self, category: Optional[str] = None, urgency: Optional[str] = None,
+             status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Tickets matching every given field, oldest first"""
+        self.flush()
+        filters = [(column, value) for column, value in
+                   (('category', category), ('urgency', urgency), ('status', status))
+                   if value is not None]
+        where = ' AND '.join(f"{column} = ?" for column, _ in filters) or '1'
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM tickets WHERE {where} ORDER BY id LIMIT ?",
+                [value for _, value in filters] + [limit]
+            ).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+    
+    def close(self):
+        """Commit outstanding tickets and stop the writer"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._db.close()
+
+# Ticket numbers when no store is configured: unique for this process only
+next_ticket_id = itertools.count(1000).__next__
+
+class ResponseTemplate:
+    """An agent response with ``{named}`` fields, compiled once.
+    
+    The template is turned into a small function whose body is a single
+    f-string, so ``render(field=...)`` costs the same as the inline f-string
+    it replaces; a template without fields returns one constant string
+    object. With ``cache_size`` the rendered text is memoized per parameter
+    value (up to that many values), so parameters that repeat (such as a
+    category) share one string instead of allocating a new one per message;
+    leave it unset for parameters that are unique per call, such as ticket
+    numbers.
+    """
+    
+    def __init__(self, text: str, cache_size: Optional[int] = None):
+        self.text = text
+        self.parts = tuple(string.Formatter().parse(text))
+        self.fields = tuple(field for _, field, _, _ in self.parts if field is not None)
+        if any(spec or conversion for _, _, spec, conversion in self.parts) \
+                or not all(field.isidentifier() for field in self.fields):
+            raise ValueError("response templates only support plain {field} placeholders")
+        self.cache_size = cache_size or 0
+        self._cache: Dict = {}
+        self.render: Callable[..., str] = self._compile()
+    
+    def _compile(self) -> Callable[..., str]:
+        body = ''.join(literal.replace('{', '{{').replace('}', '}}') + (f'{{{field}}}' if field else '')
+                       for literal, field, _, _ in self.parts)
+        fields = list(dict.fromkeys(self.fields))
+        if not fields:
+            source = f"def render():\n    return {self.text!r}\n"
+        elif not self.cache_size:
+            source = f"def render(*, {', '.join(fields)}):\n    return f{body!r}\n"
+        else:
+            key = fields[0] if len(fields) == 1 else f"({', '.join(fields)})"
+            source = (f"def render(*, {', '.join(fields)}, _cache=_cache, _size=_size):\n"
+                      f"    text = _cache.get({key})\n"
+                      f"    if text is None:\n"
+                      f"        text = f{body!r}\n"
+                      f"        if len(_cache) < _size:\n"
+                      f"            _cache[{key}] = text\n"
+                      f"    return text\n")
+        namespace = {'_cache': self._cache, '_size': self.cache_size}
+        exec(compile(source, f'<response template {self.text[:20]!r}>', 'exec'), namespace)
+        return namespace['render']
+
+# Every agent response, compiled once at import
+RESPONSE_TEMPLATES: Dict[str, ResponseTemplate] = {
+    'greeting': ResponseTemplate("Hello! Thank you for contacting our support team. I'm here to help you today. Could you please describe the issue you're experiencing?"),
+    'categorize': ResponseTemplate("I understand. This sounds like a {category} issue. Is that correct?", cache_size=64),
+    'urgency': ResponseTemplate("Thank you for confirming. To help prioritize your request, could you tell me if this is preventing you from using our service completely, or is it something that can wait a bit?"),
+    'details': ResponseTemplate("I appreciate those details. To help resolve this quickly, could you provide any error messages you're seeing, or when you first noticed this issue?"),
+    'solution': ResponseTemplate("Based on everything you've shared, here's what I recommend: [Solution tailored to your issue]. I'll also create a ticket (#{ticket}) for our team to follow up. Is there anything else I can help you with today?")
+}
+
+def respond_greeting(agent: 'CustomerSupportAI', user_input: str) -> str:
+    return RESPONSE_TEMPLATES['greeting'].render()
+
+def respond_categorize(agent: 'CustomerSupportAI', user_input: str) -> str:
+    detected_category, _ = agent.categories.classify(user_input)
+    return RESPONSE_TEMPLATES['categorize'].render(category=detected_category)
+
+def respond_urgency(agent: 'CustomerSupportAI', user_input: str) -> str:
+    return RESPONSE_TEMPLATES['urgency'].render()
+
+def respond_details(agent: 'CustomerSupportAI', user_input: str) -> str:
+    return RESPONSE_TEMPLATES['details'].render()
+
+def respond_solution(agent: 'CustomerSupportAI', user_input: str) -> str:
+    return RESPONSE_TEMPLATES['solution'].render(ticket=agent.file_ticket())
+
+# Response generators by name; chain steps refer to them via 'handler'
+RESPONSE_HANDLERS: Dict[str, Callable[['CustomerSupportAI', str], str]] = {
+    'greeting': respond_greeting,
+    'categorize': respond_categorize,
+    'urgency': respond_urgency,
+    'details': respond_details,
+    'solution': respond_solution
+}
+
+# Routers pick which of a step's 'next' transitions to follow
+ROUTERS: Dict[str, Callable[['CustomerSupportAI', str], str]] = {
+    'always': lambda agent, user_input: 'default'
+}
+
+STEPS = [
+    {
+        'id': 'greeting',
+        'name': 'Greeting',
+        'prompt': 'Greet the customer and ask what issue they need help with.',
+        'system_prompt': 'You are a friendly customer support agent. Greet the customer warmly and ask them to describe their issue briefly.',
+        'slot': 'issue',
+        'next': {'default': 'categorize'}
+    },
+    {
+        'id': 'categorize',
+        'name': 'Categorize',
+        'prompt': 'Categorize the issue into: Technical, Billing, Account, or General.',
+        'system_prompt': "Based on the customer's issue, categorize it as Technical, Billing, Account, or General. Confirm the category with the customer.",
+        'slot': 'category',
+        'next': {'default': 'urgency'}
+    },
+    {
+        'id': 'urgency',
+        'name': 'Urgency',
+        'prompt': 'Determine urgency level: Low, Medium, or High.',
+        'system_prompt': 'Ask clarifying questions to determine if this is Low (can wait), Medium (needs attention soon), or High (urgent) priority.',
+        'slot': 'urgency',
+        'next': {'default': 'details'}
+    },
+    {
+        'id': 'details',
+        'name': 'Details',
+        'prompt': 'Gather detailed information about the problem.',
+        'system_prompt': 'Ask specific questions to gather all necessary details to resolve the issue effectively.',
+        'slot': 'details',
+        'next': {'default': 'solution'}
+    },
+    {
+        'id': 'solution',
+        'name': 'Solution',
+        'prompt': 'Provide a solution or next steps.',
+        'system_prompt': 'Based on all the information gathered, provide a clear solution or escalation path. Confirm the customer is satisfied.',
+        'slot': 'solution'
+    }
+]
+
+class Role(IntEnum):
+    """Who sent a chat message; stored as one byte per message"""
+    USER = 0
+    ASSISTANT = 1
+
+ROLE_NAMES = ('user', 'assistant')
+
+class CompiledStep(NamedTuple):
+    """Dispatch-table entry for one step of a compiled chain"""
+    handler: Callable[['CustomerSupportAI', str], str]
+    router: Callable[['CustomerSupportAI', str], str]
+    transitions: Mapping[str, int]
+    slot: int
+
+class SupportChain:
+    """Immutable prompt-chain graph, compiled once and shared by every session.
+    
+    Each step names the response ``handler`` to use (default: its id), the
+    collected-data ``slot`` it fills, a ``router`` (default: ``'always'``)
+    and ``next``, mapping router outputs to step ids. A step without a
+    matching transition keeps the conversation where it is. Everything is
+    resolved to indices up front, so handling a message is a table lookup
+    no matter how large the graph is; branches such as an escalation path
+    only need a router and extra ``next`` entries.
+    
+    Steps stay available as read-only mappings (so ``step['name']`` keeps
+    working) and ``slots`` lists the collected-data fields in order.
+    """
+    
+    __slots__ = ('steps', 'slots', 'index', 'table')
+    
+    def __init__(self, steps: List[Dict]):
+        steps = tuple(MappingProxyType(dict(step)) for step in steps)
+        index = {step['id']: i for i, step in enumerate(steps)}
+        if len(index) != len(steps):
+            raise ValueError("step ids must be unique")
+        slots = tuple(dict.fromkeys(step['slot'] for step in steps if step.get('slot')))
+        
+        table = []
+        for step in steps:
+            try:
+                handler = RESPONSE_HANDLERS[step.get('handler', step['id'])]
+                router = ROUTERS[step.get('router', 'always')]
+                transitions = MappingProxyType(
+                    {key: index[target] for key, target in step.get('next', {}).items()})
+            except KeyError as e:
+                raise ValueError(f"step {step['id']!r} refers to unknown {e}") from None
+            slot = slots.index(step['slot']) if step.get('slot') else -1
+            table.append(CompiledStep(handler, router, transitions, slot))
+        
+        for name, value in (('steps', steps), ('slots', slots),
+                            ('index', MappingProxyType(index)), ('table', tuple(table))):
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("SupportChain is immutable")
+    
+    def __len__(self) -> int:
+        return len(self.steps)
+    
+    def next_step(self, step: int, agent: 'CustomerSupportAI', user_input: str) -> int:
+        """Index of the step that follows ``step`` for this message"""
+        compiled = self.table[step]
+        if not compiled.transitions:
+            return step
+        route = compiled.router(agent, user_input)
+        return compiled.transitions.get(route, compiled.transitions.get('default', step))
+
+SUPPORT_CHAIN = SupportChain(STEPS)
+
+class SessionState:
+    """Compact per-conversation state: step index, collected values and an
+    append-only message buffer (roles in a byte array, texts in a list)"""
+    
+    __slots__ = ('step', 'roles', 'texts', 'values', 'last_seen', 'spilled', 'spill_tail',
+                 'ticket', 'session_id')
+    
+    def __init__(self, slot_count: int = len(SUPPORT_CHAIN.slots)):
+        self.step = 0
+        self.roles = array('b')
+        self.texts: List[str] = []
+        self.values: List[str] = [''] * slot_count
+        self.last_seen = 0.0
+        # Messages moved out to a SpillLog, and the offset of the newest one
+        self.spilled = 0
+        self.spill_tail = -1
+        # Ticket filed for this conversation (0 = none yet)
+        self.ticket = 0
+        self.session_id: Optional[str] = None
+    
+    def append(self, role: Role, text: str):
+        # Agent replies repeat across sessions, so share one copy of each
+        self.roles.append(role)
+        self.texts.append(sys.intern(text) if role == Role.ASSISTANT else text)
+    
+    def messages(self):
+        """Iterate ``(role, text)`` pairs in order"""
+        return zip(map(Role, self.roles), self.texts)
+    
+    def __len__(self) -> int:
+        return len(self.roles)
+    
+    def dump(self) -> Tuple:
+        """Plain tuple of everything needed to rebuild this state (marshal-friendly)"""
+        return (self.step, self.roles.tobytes(), self.texts, self.values,
+                self.spilled, self.spill_tail, self.ticket)
+    
+    @classmethod
+    def load(cls, fields: Tuple, session_id: Optional[str] = None,
+             last_seen: float = 0.0) -> 'SessionState':
+        """Rebuild a state from ``dump()`` output"""
+        # marshal writes repeated objects once, so agent replies loaded from
+        # the same record still share a single copy
+        state = cls.__new__(cls)
+        (state.step, roles, state.texts, state.values,
+         state.spilled, state.spill_tail, state.ticket) = fields
+        state.roles = array('b', roles)
+        state.last_seen = last_seen
+        state.session_id = session_id
+        return state
+    
+    def snapshot(self) -> bytes:
+        """Serialize to the compact binary snapshot format"""
+        return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION) + marshal.dumps(self.dump())
+    
+    @classmethod
+    def restore(cls, data: bytes, session_id: Optional[str] = None) -> 'SessionState':
+        """Rebuild a state from ``snapshot()`` bytes"""
+        check_snapshot_header(data)
+        return cls.load(marshal.loads(memoryview(data)[SNAPSHOT_HEADER.size:]), session_id,
+                        time.monotonic())
+
+# Snapshots and checkpoint records start with a magic tag and format version
+SNAPSHOT_MAGIC = b'CSAI'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sH')
+
+def check_snapshot_header(data: bytes, offset: int = 0):
+    magic, version = SNAPSHOT_HEADER.unpack_from(data, offset)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("not a customer support snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version {version}")
+
+class SessionCheckpoint:
+    """Append-only checkpoint file of session snapshots.
+    
+    Each ``write`` appends one record holding only the sessions that changed
+    (and the ids of those that ended) since the previous one: a snapshot
+    header, the payload length and a single marshal payload. ``load``
+    replays the records in order, so the newest copy of each session wins.
+    Once the log holds more superseded entries than live sessions it is
+    compacted into one full record, written to a temporary file and
+    atomically renamed over the old one. A torn record at the end (from a
+    crash mid-write) is discarded on load.
+    
+    Spilled history is referenced by offset, so checkpointed sessions need
+    a persistent ``--spill-file`` for their older messages to survive;
+    SessionManager refuses a checkpoint with an anonymous spill log.
+    """
+    
+    LENGTH = struct.Struct('<I')
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = 0
+    
+    def _record(self, updates: Dict[str, Tuple], removed: List[str]) -> bytes:
+        payload = marshal.dumps((updates, removed))
+        return (SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION)
+                + self.LENGTH.pack(len(payload)) + payload)
+    
+    def write(self, sessions: Mapping[str, SessionState], dirty: Iterable[str],
+              removed: Iterable[str] = ()) -> int:
+        """Append the changed sessions; returns how many were written"""
+        updates = {sid: sessions[sid].dump() for sid in dirty if sid in sessions}
+        removed = [sid for sid in removed if sid not in sessions]
+        if not updates and not removed:
+            return 0
+        if self.entries + len(updates) + len(removed) > 2 * max(len(sessions), 1024):
+            return self.compact(sessions)
+        with open(self.path, 'ab') as f:
+            f.write(self._record(updates, removed))
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries += len(updates) + len(removed)
+        return len(updates)
+    
+    def compact(self, sessions: Mapping[str, SessionState]) -> int:
+        """Replace the log with one record of every live session"""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(self._record({sid: state.dump() for sid, state in sessions.items()}, []))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self.entries = len(sessions)
+        return len(sessions)
+    
+    def load(self) -> Dict[str, SessionState]:
+        """Rebuild every checkpointed session"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        latest: Dict[str, Tuple] = {}
+        header = SNAPSHOT_HEADER.size + self.LENGTH.size
+        offset = 0
+        self.entries = 0
+        # Loading creates millions of containers but no cycles; without this
+        # the cyclic collector runs over and over and dominates restore time
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            while offset + header <= len(data):
+                check_snapshot_header(data, offset)
+                length, = self.LENGTH.unpack_from(data, offset + SNAPSHOT_HEADER.size)
+                if offset + header + length > len(data):
+                    break
+                updates, removed = marshal.loads(data[offset + header:offset + header + length])
+                latest.update(updates)
+                for session_id in removed:
+                    latest.pop(session_id, None)
+                self.entries += len(updates) + len(removed)
+                offset += header + length
+            if offset < len(data):
+                # Drop the torn tail so later records are not appended after it
+                os.truncate(self.path, offset)
+            now = time.monotonic()
+            return {sid: SessionState.load(fields, sid, now) for sid, fields in latest.items()}
+        finally:
+            if collecting:
+                gc.enable()
+
+class SpillLog:
+    """Append-only on-disk log of chat messages spilled out of memory.
+    
+    Each record is ``(previous offset, role, length)`` followed by the UTF-8
+    text, so a session only has to remember the offset of its newest
+    record to recover its whole spilled transcript. Reads go through a
+    read-only memory map that is extended as the log grows. Many sessions
+    share one log; records of closed sessions are simply left behind.
+    """
+    
+    RECORD = struct.Struct('<qBI')
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.file = open(path, 'a+b') if path else tempfile.TemporaryFile()
+        self.file.seek(0, os.SEEK_END)
+        self.size = self.file.tell()
+        self._map: Optional[mmap.mmap] = None
+    
+    def append(self, previous: int, role: Role, text: str) -> int:
+        """Write one message; returns its offset"""
+        data = text.encode('utf-8')
+        offset = self.size
+        self.file.write(self.RECORD.pack(previous, role, len(data)) + data)
+        self.size += self.RECORD.size + len(data)
+        return offset
+    
+    def _view(self, end: int) -> mmap.mmap:
+        if self._map is None or len(self._map) < end:
+            self.file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+    
+    def header(self, offset: int) -> Tuple[int, int, int]:
+        """Return ``(previous, role, length)`` for the record at ``offset``"""
+        view = self._view(offset + self.RECORD.size)
+        return self.RECORD.unpack_from(view, offset)
+    
+    def read(self, offset: int) -> Tuple[Role, str]:
+        """Return ``(role, text)`` for the record at ``offset``"""
+        _, role, length = self.header(offset)
+        start = offset + self.RECORD.size
+        view = self._view(start + length)
+        return Role(role), view[start:start + length].decode('utf-8')
+    
+    def chain(self, tail: int) -> List[int]:
+        """Offsets of a session's spilled records, oldest first"""
+        offsets = []
+        while tail >= 0:
+            offsets.append(tail)
+            tail = self.header(tail)[0]
+        offsets.reverse()
+        return offsets
+    
+    def flush(self):
+        """Make every appended record durable"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+    
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.file.close()
+
+class ChatHistory:
+    """Message storage policy for sessions: keep at most ``window`` messages
+    in memory and spill older ones to a shared SpillLog.
+    
+    With no window the history is unbounded and nothing touches disk.
+    """
+    
+    def __init__(self, window: Optional[int] = None, log: Optional[SpillLog] = None):
+        if window is not None and window < 1:
+            raise ValueError("history window must be at least 1")
+        self.window = window
+        self.log = log if log is not None or window is None else SpillLog()
+    
+    def append(self, state: SessionState, role: Role, text: str):
+        state.append(role, text)
+        self.trim(state)
+    
+    def trim(self, state: SessionState):
+        """Spill whatever no longer fits in the window"""
+        excess = len(state.texts) - self.window if self.window is not None else 0
+        if excess > 0:
+            tail = state.spill_tail
+            for spilled_role, spilled_text in zip(state.roles[:excess], state.texts[:excess]):
+                tail = self.log.append(tail, spilled_role, spilled_text)
+            state.spill_tail = tail
+            state.spilled += excess
+            del state.roles[:excess]
+            del state.texts[:excess]
+    
+    def count(self, state: SessionState) -> int:
+        """Total messages in the conversation, spilled or not"""
+        return state.spilled + len(state.texts)
+    
+    def recent(self, state: SessionState, n: Optional[int] = None) -> Iterator[Tuple[Role, str]]:
+        """Lazily iterate the last ``n`` in-memory messages (never reads disk)"""
+        start = 0 if n is None else max(0, len(state.texts) - n)
+        return zip(map(Role, islice(state.roles, start, None)), islice(state.texts, start, None))
+    
+    def transcript(self, state: SessionState) -> Iterator[Tuple[Role, str]]:
+        """Lazily iterate the whole conversation, reading spilled messages back"""
+        if state.spilled:
+            for offset in self.log.chain(state.spill_tail):
+                yield self.log.read(offset)
+        yield from state.messages()
+    
+    def detach(self, state: SessionState) -> SessionState:
+        """Read a state's spilled messages back into memory, so that it no
+        longer refers to this history's log (e.g. before moving it to
+        another process, which spills to a log of its own)"""
+        if state.spilled:
+            roles = array('b')
+            texts = []
+            for role, text in self.transcript(state):
+                roles.append(role)
+                texts.append(sys.intern(text) if role == Role.ASSISTANT else text)
+            state.roles, state.texts = roles, texts
+            state.spilled, state.spill_tail = 0, -1
+        return state
+    
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+class CustomerSupportAI:
+    def __init__(self, pacing: bool = True, chain: SupportChain = SUPPORT_CHAIN,
+                 state: Optional[SessionState] = None, history: Optional[ChatHistory] = None,
+                 history_display: int = 20, categories: CategoryIndex = CATEGORY_INDEX,
+                 tickets: Optional[TicketStore] = None):
+        # Pacing adds the simulated "thinking" delays; servers turn it off
+        self.pacing = pacing
+        self.renderer = TerminalRenderer()
+        self.chain = chain
+        self.state = state or SessionState(len(chain.slots))
+        self.history = history or ChatHistory()
+        # Only this many recent messages are drawn on each redraw
+        self.history_display = history_display
+        self.categories = categories
+        self.tickets = tickets
+    
+    @property
+    def steps(self) -> Tuple[Mapping[str, str], ...]:
+        return self.chain.steps
+    
+    @property
+    def current_step(self) -> int:
+        return self.state.step
+    
+    @current_step.setter
+    def current_step(self, value: int):
+        self.state.step = value
+    
+    @property
+    def chat_history(self) -> List[Dict[str, str]]:
+        """The conversation as a list of ``{'role', 'content'}`` dicts"""
+        return [{'role': ROLE_NAMES[role], 'content': text}
+                for role, text in self.history.transcript(self.state)]
+    
+    @property
+    def collected_data(self) -> Dict[str, str]:
+        return dict(zip(self.chain.slots, self.state.values))
+    
+    def pause(self, seconds: float):
+        """Sleep to simulate thinking when pacing is enabled"""
+        if self.pacing:
+            time.sleep(seconds)
     
     def clear_screen(self):
         """Clear the console screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        self.renderer.clear()
     
     def print_header(self):
         """Print the application header"""
@@ -84,14 +931,18 @@ class CustomerSupportAI:
         print("💬 CHAT CONVERSATION:")
         print("-" * 60)
         
-        if not self.chat_history:
+        total = self.history.count(self.state)
+        if not total:
             print("   No messages yet. Start the conversation!")
         else:
-            for msg in self.chat_history:
-                if msg['role'] == 'user':
-                    print(f"\n👤 YOU: {msg['content']}")
+            hidden = total - min(self.history_display, len(self.state))
+            if hidden:
+                print(f"   … {hidden} earlier message{'s' if hidden != 1 else ''}")
+            for role, content in self.history.recent(self.state, self.history_display):
+                if role == Role.USER:
+                    print(f"\n👤 YOU: {content}")
                 else:
-                    print(f"\n🤖 AGENT: {msg['content']}")
+                    print(f"\n🤖 AGENT: {content}")
         
         print()
         print("-" * 60)
@@ -110,60 +961,80 @@ class CustomerSupportAI:
     
     def generate_response(self, user_input: str) -> str:
         """Generate AI response based on current step"""
-        step = self.current_step
-        
-        if step == 0:  # Greeting
-            return "Hello! Thank you for contacting our support team. I'm here to help you today. Could you please describe the issue you're experiencing?"
-        
-        elif step == 1:  # Categorize
-            categories = ['technical', 'billing', 'account', 'general']
-            detected_category = next((cat for cat in categories if cat in user_input.lower()), 'Technical')
-            return f"I understand. This sounds like a {detected_category.capitalize()} issue. Is that correct?"
-        
-        elif step == 2:  # Urgency
-            return "Thank you for confirming. To help prioritize your request, could you tell me if this is preventing you from using our service completely, or is it something that can wait a bit?"
-        
-        elif step == 3:  # Details
-            return "I appreciate those details. To help resolve this quickly, could you provide any error messages you're seeing, or when you first noticed this issue?"
-        
-        elif step == 4:  # Solution
-            import random
-            ticket_number = random.randint(1000, 9999)
-            return f"Based on everything you've shared, here's what I recommend: [Solution tailored to your issue]. I'll also create a ticket (#{ticket_number}) for our team to follow up. Is there anything else I can help you with today?"
-        
-        return "Thank you for your response."
+        return self.chain.table[self.current_step].handler(self, user_input)
     
     def update_collected_data(self, user_input: str):
         """Update collected data based on current step"""
-        step_keys = ['issue', 'category', 'urgency', 'details', 'solution']
-        if self.current_step < len(step_keys):
-            self.collected_data[step_keys[self.current_step]] = user_input
+        slot = self.chain.table[self.current_step].slot
+        if slot >= 0:
+            self.state.values[slot] = user_input
     
     def display_ui(self):
         """Display the complete UI"""
-        self.clear_screen()
-        self.print_header()
-        self.print_steps()
-        self.print_chat_history()
-        self.print_collected_data()
+        with self.renderer.frame():
+            self.print_header()
+            self.print_steps()
+            self.print_chat_history()
+            self.print_collected_data()
+    
+    def ticket_fields(self) -> Dict[str, str]:
+        """Collected data normalized for filing a ticket"""
+        data = self.collected_data
+        about = ' '.join(filter(None, (data.get('category'), data.get('issue'))))
+        data['category'] = self.categories.classify(about)[0] if about else None
+        data['urgency'] = classify_urgency(data['urgency']) if data.get('urgency') else None
+        return data
     
-    def process_message(self, user_input: str):
+    def file_ticket(self, status: str = 'open') -> int:
+        """Create (or update) the ticket for this conversation"""
+        state = self.state
+        if not state.ticket:
+            state.ticket = self.tickets.allocate() if self.tickets else next_ticket_id()
+        if self.tickets:
+            self.tickets.save(state.ticket, self.ticket_fields(), state.session_id, status)
+        return state.ticket
+    
+    def reset(self):
+        """Start a fresh conversation on the same chain"""
+        # Keep what an unfinished conversation collected instead of dropping it
+        if self.tickets and not self.state.ticket and any(self.state.values):
+            self.file_ticket(status='incomplete')
+        self.state = SessionState(len(self.chain.slots))
+    
+    def snapshot(self) -> bytes:
+        """Binary snapshot of the current conversation"""
+        return self.state.snapshot()
+    
+    def restore(self, data: bytes):
+        """Resume a conversation from ``snapshot()`` bytes"""
+        self.state = SessionState.restore(data, self.state.session_id)
+    
+    def greet(self) -> str:
+        """Open the conversation with the agent's greeting"""
+        greeting = self.generate_response("")
+        self.history.append(self.state, Role.ASSISTANT, greeting)
+        return greeting
+    
+    def process_message(self, user_input: str) -> str:
         """Process user message and generate response"""
         # Add user message
-        self.chat_history.append({'role': 'user', 'content': user_input})
+        self.history.append(self.state, Role.USER, user_input)
         
         # Update collected data
         self.update_collected_data(user_input)
         
         # Generate AI response
-        time.sleep(0.5)  # Simulate thinking
+        self.pause(0.5)  # Simulate thinking
         ai_response = self.generate_response(user_input)
-        self.chat_history.append({'role': 'assistant', 'content': ai_response})
+        self.history.append(self.state, Role.ASSISTANT, ai_response)
         
         # Move to next step
-        if self.current_step < len(self.steps) - 1:
-            time.sleep(0.5)
-            self.current_step += 1
+        next_step = self.chain.next_step(self.current_step, self, user_input)
+        if next_step != self.current_step:
+            self.pause(0.5)
+            self.current_step = next_step
+        
+        return ai_response
     
     def run(self):
         """Main application loop"""
@@ -173,8 +1044,7 @@ class CustomerSupportAI:
         input("Press Enter to start...")
         
         # Initial greeting
-        greeting = self.generate_response("")
-        self.chat_history.append({'role': 'assistant', 'content': greeting})
+        self.greet()
         
         while True:
             self.display_ui()
@@ -195,9 +1065,8 @@ class CustomerSupportAI:
                 break
             
             if user_input.lower() == 'reset':
-                self.__init__()
-                greeting = self.generate_response("")
-                self.chat_history.append({'role': 'assistant', 'content': greeting})
+                self.reset()
+                self.greet()
                 continue
             
             # Process the message
@@ -207,15 +1076,1295 @@ class CustomerSupportAI:
                 print("\n⚠️  Conversation is complete. Type 'reset' to start over.")
                 time.sleep(2)
 
+class SessionManager:
+    """Many independent support conversations keyed by session id.
+    
+    Only a compact SessionState is kept per session; a single unpaced
+    CustomerSupportAI is bound to each state in turn to run the chain.
+    Sessions are created on first contact (and greeted) and can be expired
+    after ``idle_timeout`` seconds without a message. Sessions changed since
+    the last ``checkpoint`` are tracked so only they are written out.
+    """
+    
+    def __init__(self, idle_timeout: Optional[float] = None,
+                 chain: SupportChain = SUPPORT_CHAIN, history: Optional[ChatHistory] = None,
+                 tickets: Optional[TicketStore] = None,
+                 checkpoint: Optional[SessionCheckpoint] = None):
+        self.idle_timeout = idle_timeout
+        self.agent = CustomerSupportAI(pacing=False, chain=chain, history=history,
+                                       tickets=tickets)
+        log = self.agent.history.log
+        if checkpoint is not None and log is not None and log.path is None:
+            # Restored spill offsets would point into a new, empty temporary log
+            raise ValueError("checkpointing a history window needs a persistent spill file")
+        self.checkpoints = checkpoint
+        self.sessions: Dict[str, SessionState] = checkpoint.load() if checkpoint else {}
+        self.dirty = set()
+        self.removed = set()
+    
+    def __len__(self) -> int:
+        return len(self.sessions)
+    
+    def count(self) -> int:
+        return len(self.sessions)
+    
+    def export(self, session_id: str) -> Optional[bytes]:
+        """Hand a session over: return its snapshot and forget it here"""
+        state = self.sessions.pop(session_id, None)
+        if state is None:
+            return None
+        self.dirty.discard(session_id)
+        self.removed.add(session_id)
+        # Spilled offsets point into this manager's log, which the adopter cannot read
+        return self.agent.history.detach(state).snapshot()
+    
+    def adopt(self, session_id: str, snapshot: bytes):
+        """Take over a session exported by another manager"""
+        state = SessionState.restore(snapshot, session_id)
+        self.agent.history.trim(state)
+        self.sessions[session_id] = state
+        self.removed.discard(session_id)
+        self.dirty.add(session_id)
+    
+    def bind(self, session_id: str) -> CustomerSupportAI:
+        """Point the shared agent at a session, starting it if needed"""
+        agent = self.agent
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = SessionState(len(agent.chain.slots))
+            state.session_id = session_id
+            agent.state = state
+            agent.greet()
+        agent.state = state
+        state.last_seen = time.monotonic()
+        self.dirty.add(session_id)
+        return agent
+    
+    def process_message(self, session_id: str, text: str) -> Dict:
+        """Feed one customer message into a session and return the reply"""
+        agent = self.bind(session_id)
+        step = agent.current_step
+        reply = agent.process_message(text)
+        return {
+            'session_id': session_id,
+            'step': agent.steps[step]['id'],
+            'reply': reply,
+            'next_step': agent.steps[agent.current_step]['id']
+        }
+    
+    def describe(self, session_id: str) -> Optional[Dict]:
+        """Return a JSON-friendly view of a session, or None if unknown"""
+        if session_id not in self.sessions:
+            return None
+        agent = self.agent
+        agent.state = self.sessions[session_id]
+        return {
+            'session_id': session_id,
+            'step': agent.steps[agent.current_step]['id'],
+            'chat_history': agent.chat_history,
+            'collected_data': agent.collected_data
+        }
+    
+    def close(self, session_id: str) -> bool:
+        """Forget a session; returns whether it existed"""
+        state = self.sessions.pop(session_id, None)
+        if state is None:
+            return False
+        self.dirty.discard(session_id)
+        self.removed.add(session_id)
+        if self.agent.tickets:
+            # Resetting files whatever an unfinished conversation collected
+            self.agent.state = state
+            self.agent.reset()
+        return True
+    
+    def checkpoint(self) -> int:
+        """Write sessions changed since the last checkpoint; returns how many"""
+        if self.checkpoints is None:
+            return 0
+        if self.agent.history.log is not None:
+            # Checkpointed spill offsets must never point past the end of the log
+            self.agent.history.log.flush()
+        written = self.checkpoints.write(self.sessions, self.dirty, self.removed)
+        self.dirty.clear()
+        self.removed.clear()
+        return written
+    
+    def expire_idle(self) -> int:
+        """Drop sessions idle for longer than ``idle_timeout``"""
+        if self.idle_timeout is None:
+            return 0
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [sid for sid, state in self.sessions.items() if state.last_seen < cutoff]
+        for session_id in expired:
+            self.close(session_id)
+        return len(expired)
+
+class HashRing:
+    """Consistent hashing of session ids onto worker indices.
+    
+    Every worker owns ``replicas`` points on a 64-bit ring (blake2b), so
+    growing or shrinking the pool moves only about 1/n of the sessions.
+    """
+    
+    def __init__(self, workers: Iterable[int], replicas: int = 128):
+        points = sorted((self._hash(f"{worker}#{replica}"), worker)
+                        for worker in workers for replica in range(replicas))
+        if not points:
+            raise ValueError("a hash ring needs at least one worker")
+        self._keys = [point for point, _ in points]
+        self._owners = [worker for _, worker in points]
+    
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+    
+    def owner(self, session_id: str) -> int:
+        i = bisect.bisect(self._keys, self._hash(session_id))
+        return self._owners[i % len(self._owners)]
+
+FRAME = struct.Struct('<I')
+# Ticket ids are interleaved over this many shard slots
+MAX_SHARDS = 64
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def _shard_main(sock: socket.socket, index: int, options: Dict, inherited: List[socket.socket]):
+    """Worker process: run a SessionManager for one shard.
+    
+    Requests arrive as length-prefixed pickled batches of commands and are
+    answered, in order, with one batch of ``(ok, value)`` replies.
+    """
+    global next_ticket_id
+    # Other shards' router sockets would keep them from seeing EOF
+    for other in inherited:
+        other.close()
+    next_ticket_id = itertools.count(1000 + index, MAX_SHARDS).__next__
+    suffix = f".{index}"
+    window = options.get('history_window')
+    spill = options.get('spill_file')
+    history = ChatHistory(window, SpillLog(spill + suffix) if window and spill else None)
+    store = (TicketStore(options['ticket_db'], stride=MAX_SHARDS, offset=index)
+             if options.get('ticket_db') else None)
+    checkpoint = (SessionCheckpoint(options['checkpoint'] + suffix)
+                  if options.get('checkpoint') else None)
+    manager = SessionManager(idle_timeout=options.get('idle_timeout'), history=history,
+                             tickets=store, checkpoint=checkpoint)
+    cpu_cost = options.get('cpu_us', 0) / 1e6
+    # Housekeeping runs this often, between batches or while waiting for one
+    ticks = [options.get('checkpoint_interval', 5.0)] if checkpoint else []
+    if manager.idle_timeout is not None:
+        ticks.append(max(1.0, manager.idle_timeout / 4))
+    interval = min(ticks) if ticks else None
+    
+    def message(session_id: str, text: str) -> Dict:
+        if cpu_cost:
+            # Stand-in for per-message model work in benchmarks
+            deadline = time.perf_counter() + cpu_cost
+            while time.perf_counter() < deadline:
+                pass
+        return manager.process_message(session_id, text)
+    
+    commands = {
+        'message': message,
+        'describe': manager.describe,
+        'close': manager.close,
+        'export': manager.export,
+        'adopt': manager.adopt,
+        'list': lambda: list(manager.sessions),
+        'count': manager.count,
+        'checkpoint': manager.checkpoint
+    }
+    housekept = time.monotonic()
+    try:
+        while True:
+            if interval:
+                # Due even under steady load, when the socket never goes quiet
+                if time.monotonic() - housekept >= interval:
+                    manager.expire_idle()
+                    manager.checkpoint()
+                    housekept = time.monotonic()
+                wait = housekept + interval - time.monotonic()
+                if not select.select([sock], [], [], max(0.0, wait))[0]:
+                    continue
+            length, = FRAME.unpack(_recv_exactly(sock, FRAME.size))
+            batch = pickle.loads(_recv_exactly(sock, length))
+            if batch is None:
+                break
+            replies = []
+            for name, *arguments in batch:
+                try:
+                    replies.append((True, commands[name](*arguments)))
+                except Exception as e:
+                    replies.append((False, f"{type(e).__name__}: {e}"))
+            data = pickle.dumps(replies, pickle.HIGHEST_PROTOCOL)
+            sock.sendall(FRAME.pack(len(data)) + data)
+    except (EOFError, ConnectionError, KeyboardInterrupt):
+        pass
+    finally:
+        manager.checkpoint()
+        if store:
+            store.close()
+        sock.close()
+
+class ShardWorker:
+    """Router-side handle for one worker process.
+    
+    Commands issued during one event-loop turn are coalesced into a single
+    frame; the worker answers in order, so replies are matched to waiting
+    futures first-in, first-out.
+    """
+    
+    def __init__(self, index: int, options: Dict, inherited: List[socket.socket] = ()):
+        self.index = index
+        parent, child = socket.socketpair()
+        context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+        self.process = context.Process(target=_shard_main, name=f"support-shard-{index}",
+                                       args=(child, index, options, list(inherited)), daemon=True)
+        self.process.start()
+        child.close()
+        self._socket = parent
+        self._pending = deque()
+        self._outbox = []
+        self._reader = self._writer = None
+        self._receiver = None
+    
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(sock=self._socket)
+        self._receiver = asyncio.ensure_future(self._receive())
+    
+    def request(self, *command) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        self._outbox.append(command)
+        if len(self._outbox) == 1:
+            asyncio.get_running_loop().call_soon(self._flush)
+        return future
+    
+    def _flush(self):
+        batch, self._outbox = self._outbox, []
+        data = pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+        self._writer.write(FRAME.pack(len(data)) + data)
+    
+    async def _receive(self):
+        try:
+            while True:
+                length, = FRAME.unpack(await self._reader.readexactly(FRAME.size))
+                for ok, value in pickle.loads(await self._reader.readexactly(length)):
+                    future = self._pending.popleft()
+                    if future.done():
+                        continue
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(RuntimeError(value))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            while self._pending:
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError(f"shard {self.index} exited"))
+    
+    async def stop(self):
+        if self._writer is not None:
+            if self._outbox:
+                self._flush()
+            data = pickle.dumps(None)
+            self._writer.write(FRAME.pack(len(data)) + data)
+            await self._writer.drain()
+        await asyncio.get_running_loop().run_in_executor(None, self.process.join, 10)
+        if self._receiver is not None:
+            self._receiver.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+class ShardedSessionManager:
+    """SessionManager API over a pool of worker processes.
+    
+    Sessions are placed by consistent hash of their id. ``resize`` changes
+    the pool size and live-migrates every session whose owner changed:
+    routing is paused while sessions are listed and pinned to their current
+    worker, then each one is exported (after any messages already queued
+    for it) and adopted by its new worker while messages for that session
+    wait. Nothing is dropped and other sessions keep flowing. Ticket ids
+    are interleaved across workers so they never collide. Each worker
+    checkpoints to its own ``<checkpoint>.<index>`` file; on start, every
+    such file is loaded, whatever the pool size was when it was written,
+    and its sessions are rehashed onto the current workers.
+    """
+    
+    idle_timeout = None
+    checkpoints = None
+    
+    def __init__(self, workers: int = 2, **options):
+        if not 1 <= workers <= MAX_SHARDS:
+            raise ValueError(f"worker count must be between 1 and {MAX_SHARDS}")
+        self.options = options
+        self.workers: List[ShardWorker] = []
+        self.ring = HashRing(range(workers))
+        self.size = workers
+        self.pins: Dict[str, int] = {}
+        self.moving: Dict[str, asyncio.Event] = {}
+        self.routing = None
+    
+    async def start(self):
+        """Spawn the workers and move any restored session to its owner"""
+        self.routing = asyncio.Event()
+        self.routing.set()
+        # Checkpoints left by a larger pool are loaded by workers of their
+        # own, which the resize below drains and retires
+        await self._spawn(max(self.size, len(self._checkpoint_files())))
+        await self.resize(self.size)
+        return self
+    
+    def _checkpoint_files(self) -> List[str]:
+        """Checkpoint file of every worker index up to the highest one on disk"""
+        path = self.options.get('checkpoint')
+        if not path:
+            return []
+        directory, prefix = os.path.split(path)
+        indexes = [int(suffix) for suffix in
+                   (name[len(prefix) + 1:] for name in os.listdir(directory or '.')
+                    if name.startswith(prefix + '.'))
+                   if suffix.isdigit() and int(suffix) < MAX_SHARDS]
+        return [f"{path}.{index}" for index in range(max(indexes, default=-1) + 1)]
+    
+    async def _spawn(self, workers: int):
+        while len(self.workers) < workers:
+            worker = ShardWorker(len(self.workers), self.options,
+                                 [other._socket for other in self.workers])
+            await worker.connect()
+            self.workers.append(worker)
+    
+    def owner(self, session_id: str) -> ShardWorker:
+        index = self.pins.get(session_id)
+        return self.workers[self.ring.owner(session_id) if index is None else index]
+    
+    async def _ready(self, session_id: str):
+        while not self.routing.is_set() or session_id in self.moving:
+            await self.routing.wait()
+            event = self.moving.get(session_id)
+            if event is not None:
+                await event.wait()
+    
+    async def call(self, session_id: str, *command):
+        await self._ready(session_id)
+        return await self.owner(session_id).request(*command)
+    
+    async def process_message(self, session_id: str, text: str) -> Dict:
+        return await self.call(session_id, 'message', session_id, text)
+    
+    async def process_batch(self, messages: List[Tuple[str, str]]) -> List[Dict]:
+        """Process many ``(session_id, text)`` pairs, all in flight at once"""
+        return await asyncio.gather(*(self.process_message(sid, text) for sid, text in messages))
+    
+    async def describe(self, session_id: str) -> Optional[Dict]:
+        return await self.call(session_id, 'describe', session_id)
+    
+    async def close(self, session_id: str) -> bool:
+        return await self.call(session_id, 'close', session_id)
+    
+    async def count(self) -> int:
+        return sum(await asyncio.gather(*(worker.request('count') for worker in self.workers)))
+    
+    async def migrate(self, session_id: str, target: int):
+        """Move one session to worker ``target`` without losing messages"""
+        source = self.owner(session_id)
+        if source.index == target:
+            return
+        event = self.moving[session_id] = asyncio.Event()
+        try:
+            snapshot = await source.request('export', session_id)
+            if snapshot is not None:
+                await self.workers[target].request('adopt', session_id, snapshot)
+            self.pins.pop(session_id, None)
+            if self.ring.owner(session_id) != target:
+                self.pins[session_id] = target
+        finally:
+            del self.moving[session_id]
+            event.set()
+    
+    async def resize(self, workers: int) -> int:
+        """Grow or shrink the pool; returns how many sessions moved"""
+        if not 1 <= workers <= MAX_SHARDS:
+            raise ValueError(f"worker count must be between 1 and {MAX_SHARDS}")
+        self.routing.clear()
+        try:
+            await self._spawn(workers)
+            listings = await asyncio.gather(*(worker.request('list') for worker in self.workers))
+            ring = HashRing(range(workers))
+            moves = []
+            for worker, session_ids in zip(self.workers, listings):
+                for session_id in session_ids:
+                    target = ring.owner(session_id)
+                    if target != worker.index:
+                        self.pins[session_id] = worker.index
+                        moves.append((session_id, target))
+            self.ring = ring
+            self.size = workers
+        finally:
+            self.routing.set()
+        
+        await asyncio.gather(*(self.migrate(session_id, target) for session_id, target in moves))
+        for worker in self.workers[workers:]:
+            await worker.stop()
+        del self.workers[workers:]
+        # Every session of a retired worker now lives on, and is checkpointed by, another one
+        for path in self._checkpoint_files()[workers:]:
+            if os.path.exists(path):
+                os.remove(path)
+        return len(moves)
+    
+    async def stop(self):
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+        self.workers = []
+
+class SupportServer:
+    """Minimal asyncio HTTP/1.1 front end for a SessionManager (stdlib only).
+    
+    Routes:
+        POST   /sessions/<id>/messages   body: {"text": ...} or plain text
+        GET    /sessions/<id>            conversation state
+        DELETE /sessions/<id>            end the conversation
+        GET    /health                   number of live sessions
+        PUT    /workers                  body: {"count": N} (sharded managers only)
+    Connections are kept alive, so a client can stream many messages over
+    one socket.
+    """
+    
+    MAX_BODY = 64 * 1024
+    REASONS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+    
+    def __init__(self, manager: SessionManager, host: str = '127.0.0.1', port: int = 8080,
+                 checkpoint_interval: float = 5.0):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.checkpoint_interval = checkpoint_interval
+        self.server = None
+    
+    async def start(self):
+        """Start listening; returns the asyncio server"""
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+    
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            if self.manager.idle_timeout is not None:
+                asyncio.ensure_future(self._expire_loop())
+            if self.manager.checkpoints is not None:
+                asyncio.ensure_future(self._checkpoint_loop())
+            try:
+                await self.server.serve_forever()
+            finally:
+                if self.manager.checkpoints is not None:
+                    self.manager.checkpoint()
+    
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            self.manager.checkpoint()
+    
+    async def _expire_loop(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.manager.idle_timeout / 4))
+            self.manager.expire_idle()
+    
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'malformed request line'}, False)
+                    break
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Without a usable length the next request cannot be found
+                    await self._respond(writer, 400, {'error': 'invalid Content-Length'}, False)
+                    break
+                if length > self.MAX_BODY:
+                    await self._respond(writer, 413, {'error': 'body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                
+                connection = headers.get('connection', '').lower()
+                keep_alive = (connection != 'close' if version == 'HTTP/1.1'
+                              else connection == 'keep-alive')
+                try:
+                    status, payload = await self.route(method, target, body)
+                except Exception as e:
+                    print(f"⚠️  {method} {target} failed: {type(e).__name__}: {e}", file=sys.stderr)
+                    status, payload = 500, {'error': f'{type(e).__name__}: {e}'}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def route(self, method: str, target: str, body: bytes) -> Tuple[int, Optional[Dict]]:
+        """Dispatch one request to the session manager"""
+        path = target.split('?', 1)[0]
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        manager = self.manager
+        
+        async def call(result):
+            # Sharded managers answer asynchronously, plain ones directly
+            return await result if inspect.isawaitable(result) else result
+        
+        if parts == ['health']:
+            return 200, {'status': 'ok', 'sessions': await call(manager.count())}
+        if parts == ['workers'] and hasattr(manager, 'resize'):
+            if method != 'PUT':
+                return 405, {'error': 'use PUT'}
+            try:
+                workers = int(json.loads(body or b'{}').get('count', 0))
+            except (ValueError, AttributeError, TypeError):
+                return 400, {'error': 'expected {"count": N}'}
+            if not 1 <= workers <= MAX_SHARDS:
+                return 400, {'error': f'worker count must be between 1 and {MAX_SHARDS}'}
+            return 200, {'workers': workers, 'moved': await manager.resize(workers)}
+        if len(parts) == 3 and parts[0] == 'sessions' and parts[2] == 'messages':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            text = body.decode('utf-8', errors='replace').strip()
+            if text.startswith('{'):
+                try:
+                    text = str(json.loads(text).get('text', '')).strip()
+                except (ValueError, AttributeError):
+                    return 400, {'error': 'invalid JSON body'}
+            if not text:
+                return 400, {'error': 'empty message'}
+            return 200, await call(manager.process_message(parts[1], text))
+        if len(parts) == 2 and parts[0] == 'sessions':
+            if method == 'GET':
+                state = await call(manager.describe(parts[1]))
+                return (200, state) if state is not None else (404, {'error': 'unknown session'})
+            if method == 'DELETE':
+                closed = await call(manager.close(parts[1]))
+                return (204, None) if closed else (404, {'error': 'unknown session'})
+            return 405, {'error': 'use GET or DELETE'}
+        return 404, {'error': 'not found'}
+    
+    async def _respond(self, writer: asyncio.StreamWriter, status: int,
+                       payload: Optional[Dict], keep_alive: bool):
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {self.REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+def add_session_options(parser: argparse.ArgumentParser, suppress: bool = False):
+    """Session flags, accepted both before and after a subcommand"""
+    # A subcommand's own defaults would overwrite values given before it
+    default = (lambda value: argparse.SUPPRESS) if suppress else (lambda value: value)
+    parser.add_argument('--history-window', type=int, metavar='N', default=default(None),
+                        help="keep only the last N messages of a session in memory")
+    parser.add_argument('--spill-file', metavar='PATH', default=default(None),
+                        help="append-only log for messages beyond the window "
+                             "(default: an anonymous temporary file)")
+    parser.add_argument('--history-display', type=int, metavar='N', default=default(20),
+                        help="recent messages drawn in the chat panel")
+    parser.add_argument('--ticket-db', metavar='PATH', default=default(None),
+                        help="SQLite file where tickets are persisted")
+
+def make_history(args: argparse.Namespace) -> ChatHistory:
+    log = SpillLog(args.spill_file) if args.history_window and args.spill_file else None
+    return ChatHistory(args.history_window, log)
+
+# Customer lines for synthetic transcripts, one pool per chain step
+SYNTHETIC_MESSAGES = {
+    'greeting': ["My internet keeps dropping every few minutes", "I was charged twice this month",
+                 "I can't log in to my account", "I have a question about your opening hours",
+                 "The app crashes when I upload a photo"],
+    'categorize': ["Yes, it's technical", "Billing, I think", "It's about my account",
+                   "Just a general question", "Yes that's right"],
+    'urgency': ["It's urgent, I can't use the service at all", "It can wait a bit",
+                "Fairly soon please", "High priority", "Not urgent"],
+    'details': ["Error code 0x80070005 since yesterday", "Started after the last update",
+                "The invoice number is 48213", "I reset my password twice already",
+                "It happens on both my phone and laptop"],
+    'solution': ["Thanks, that helps", "Okay, I'll wait for the ticket", "That's all, thank you"]
+}
+
+def synthetic_transcripts(count: int, seed: int = 0) -> List[List[str]]:
+    """Customer sides of ``count`` conversations walking the whole chain"""
+    rng = random.Random(seed)
+    order = [step['id'] for step in STEPS]
+    return [[rng.choice(SYNTHETIC_MESSAGES[step]) for step in order] for _ in range(count)]
+
+def load_transcripts(path: str) -> List[List[str]]:
+    """Recorded transcripts from JSONL: a list of customer messages per line,
+    or an object with ``messages`` (strings, or ``{role, content}`` dicts
+    of which only the user's are replayed)"""
+    transcripts = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            messages = record.get('messages', record.get('chat_history', [])) if isinstance(record, dict) else record
+            texts = [m if isinstance(m, str) else m.get('content', '')
+                     for m in messages if isinstance(m, str) or m.get('role') == 'user']
+            if texts:
+                transcripts.append(texts)
+    if not transcripts:
+        raise ValueError(f"no transcripts found in {path}")
+    return transcripts
+
+class HttpTarget:
+    """Send messages to a running ``serve`` instance, one keep-alive
+    connection per simulated customer"""
+    
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.connections: Dict[str, Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = {}
+    
+    async def send(self, session_id: str, text: str) -> str:
+        connection = self.connections.get(session_id)
+        if connection is None:
+            connection = self.connections[session_id] = await asyncio.open_connection(self.host, self.port)
+        reader, writer = connection
+        body = json.dumps({'text': text}).encode('utf-8')
+        writer.write(
+            f"POST {self.prefix}/sessions/{session_id}/messages HTTP/1.1\r\n"
+            f"Host: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+        head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split()[1])
+        length = next((int(line.split(':', 1)[1]) for line in head[1:]
+                       if line.lower().startswith('content-length:')), 0)
+        payload = json.loads(await reader.readexactly(length)) if length else {}
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}: {payload.get('error', '')}")
+        return payload['step']
+    
+    async def finish(self, session_id: str):
+        connection = self.connections.pop(session_id, None)
+        if connection is not None:
+            connection[1].close()
+
+class InProcessTarget:
+    """Drive a SessionManager in this process"""
+    
+    def __init__(self, manager: SessionManager):
+        self.manager = manager
+    
+    async def send(self, session_id: str, text: str) -> str:
+        return self.manager.process_message(session_id, text)['step']
+    
+    async def finish(self, session_id: str):
+        # Like the server, keep the session around after the customer leaves
+        pass
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+def resident_memory() -> Optional[int]:
+    """Current resident set size in bytes (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class LoadGenerator:
+    """Replay customer transcripts against many concurrent sessions.
+    
+    New customers arrive as a Poisson process at ``rate`` per second (all
+    at once when no rate is given), each replaying one transcript with an
+    exponentially distributed ``think`` time between messages. Latency is
+    recorded per chain step.
+    """
+    
+    def __init__(self, target, transcripts: List[List[str]], rate: Optional[float] = None,
+                 think: float = 0.0, seed: int = 0):
+        self.target = target
+        self.transcripts = transcripts
+        self.rate = rate
+        self.think = think
+        self.rng = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors = 0
+        self.messages = 0
+    
+    async def customer(self, session_id: str, transcript: List[str], think: List[float]):
+        try:
+            for text, pause in zip(transcript, think):
+                if pause:
+                    await asyncio.sleep(pause)
+                start = time.perf_counter()
+                step = await self.target.send(session_id, text)
+                self.latencies.setdefault(step, []).append(time.perf_counter() - start)
+                self.messages += 1
+        except (OSError, RuntimeError, asyncio.IncompleteReadError, ValueError, KeyError):
+            self.errors += 1
+        finally:
+            await self.target.finish(session_id)
+    
+    async def run(self, sessions: int) -> Dict:
+        rss_start = resident_memory()
+        start = time.perf_counter()
+        customers = []
+        for i in range(sessions):
+            if self.rate:
+                await asyncio.sleep(self.rng.expovariate(self.rate))
+            transcript = self.transcripts[i % len(self.transcripts)]
+            think = [self.rng.expovariate(1 / self.think) if self.think and n else 0.0
+                     for n in range(len(transcript))]
+            customers.append(asyncio.ensure_future(self.customer(f"load-{i}", transcript, think)))
+        await asyncio.gather(*customers)
+        elapsed = time.perf_counter() - start
+        rss_end = resident_memory()
+        
+        steps = {}
+        for step, samples in self.latencies.items():
+            samples.sort()
+            steps[step] = {
+                'count': len(samples),
+                'p50_ms': percentile(samples, 0.50) * 1000,
+                'p95_ms': percentile(samples, 0.95) * 1000,
+                'p99_ms': percentile(samples, 0.99) * 1000
+            }
+        every = sorted(sample for samples in self.latencies.values() for sample in samples)
+        return {
+            'sessions': sessions,
+            'messages': self.messages,
+            'errors': self.errors,
+            'seconds': elapsed,
+            'messages_per_second': self.messages / elapsed if elapsed else 0.0,
+            'p99_ms': percentile(every, 0.99) * 1000,
+            'steps': steps,
+            'rss_growth_bytes': rss_end - rss_start if rss_start is not None and rss_end is not None else None
+        }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Customer support prompt chain demo")
+    add_session_options(parser)
+    commands = parser.add_subparsers(dest='command')
+    
+    serve = commands.add_parser('serve', help="serve many concurrent sessions over HTTP")
+    add_session_options(serve, suppress=True)
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--idle-timeout', type=float, metavar='SECONDS',
+                       help="forget sessions idle for this long")
+    serve.add_argument('--checkpoint', metavar='PATH',
+                       help="restore sessions from and periodically checkpoint them to PATH")
+    serve.add_argument('--checkpoint-interval', type=float, default=5.0, metavar='SECONDS')
+    serve.add_argument('--shards', type=int, metavar='N',
+                       help="spread sessions over N worker processes behind this router "
+                            "(checkpoints, spill files become one per shard)")
+    
+    memory = commands.add_parser('bench-memory', help="measure memory per session")
+    memory.add_argument('sessions', type=int, nargs='?', default=100_000)
+    memory.add_argument('--messages', type=int, default=3,
+                        help="customer messages sent to each session")
+    
+    chain = commands.add_parser('bench-chain', help="per-message cost as the chain grows")
+    chain.add_argument('--sizes', type=int, nargs='+', default=[5, 50, 200, 500, 1000],
+                       metavar='STEPS')
+    chain.add_argument('--messages', type=int, default=50_000)
+    
+    classify = commands.add_parser('classify', help="categorize a backlog of tickets, one per line")
+    classify.add_argument('tickets', nargs='?', default='-', help="file of tickets (default: stdin)")
+    classify.add_argument('--keywords', metavar='JSON',
+                          help='keyword table: {"Category": ["term", ...] or {"term": weight}}')
+    classify.add_argument('--summary', action='store_true',
+                          help="print ticket counts per category instead of one line each")
+    
+    tickets = commands.add_parser('tickets', help="look up persisted tickets")
+    tickets.add_argument('db', help="ticket database written via --ticket-db")
+    tickets.add_argument('--id', type=int, help="show one ticket")
+    tickets.add_argument('--category')
+    tickets.add_argument('--urgency', choices=('Low', 'Medium', 'High'))
+    tickets.add_argument('--status', choices=('open', 'incomplete'))
+    tickets.add_argument('--limit', type=int, default=100)
+    
+    bench_tickets = commands.add_parser('bench-tickets', help="ticket write throughput")
+    bench_tickets.add_argument('count', type=int, nargs='?', default=50_000)
+    bench_tickets.add_argument('--db', help="database file (default: a temporary one)")
+    
+    load = commands.add_parser('loadgen', help="replay transcripts against many sessions")
+    add_session_options(load, suppress=True)
+    load.add_argument('--sessions', type=int, default=10_000)
+    load.add_argument('--rate', type=float, metavar='PER_SECOND',
+                      help="Poisson arrival rate of new customers (default: all at once)")
+    load.add_argument('--think', type=float, default=0.0, metavar='SECONDS',
+                      help="mean pause between a customer's messages")
+    load.add_argument('--transcripts', metavar='JSONL',
+                      help="recorded transcripts to replay (default: synthetic)")
+    load.add_argument('--url', help="load a running server instead of an in-process manager")
+    load.add_argument('--seed', type=int, default=0)
+    load.add_argument('--max-p99-ms', type=float, help="fail if overall p99 latency exceeds this")
+    load.add_argument('--min-throughput', type=float, metavar='MSGS_PER_SECOND',
+                      help="fail if throughput drops below this")
+    
+    templates = commands.add_parser('bench-templates',
+                                    help="allocations per response: templates vs inline f-strings")
+    templates.add_argument('--messages', type=int, default=100_000)
+    
+    snapshot = commands.add_parser('bench-snapshot', help="checkpoint and restore timings")
+    snapshot.add_argument('sessions', type=int, nargs='?', default=100_000)
+    snapshot.add_argument('--changed', type=float, default=0.01,
+                          help="fraction of sessions changed before the incremental checkpoint")
+    
+    shards = commands.add_parser('bench-shards', help="throughput as worker processes are added")
+    shards.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, max(1, os.cpu_count() or 1)}))
+    shards.add_argument('--sessions', type=int, default=5_000)
+    shards.add_argument('--cpu-us', type=float, default=100.0,
+                        help="simulated model cost per message in each worker")
+    args = parser.parse_args(argv)
+    if (args.command == 'serve' and args.checkpoint and args.history_window
+            and not args.spill_file):
+        parser.error("--checkpoint with --history-window needs --spill-file: spilled "
+                     "messages are checkpointed by their offset in that file")
+    return args
+
+def shard_options(args: argparse.Namespace) -> Dict:
+    """Per-worker settings for a sharded manager"""
+    return {
+        'history_window': args.history_window,
+        'spill_file': args.spill_file,
+        'ticket_db': args.ticket_db,
+        'checkpoint': getattr(args, 'checkpoint', None),
+        'checkpoint_interval': getattr(args, 'checkpoint_interval', 5.0),
+        'idle_timeout': getattr(args, 'idle_timeout', None)
+    }
+
+def serve_sharded(args: argparse.Namespace):
+    """Run the HTTP router in front of ``--shards`` worker processes"""
+    manager = ShardedSessionManager(args.shards, **shard_options(args))
+    server = SupportServer(manager, args.host, args.port)
+    
+    async def run_server():
+        await manager.start()
+        try:
+            restored = await manager.count()
+            if restored:
+                print(f"Restored {restored} sessions from {args.checkpoint}.*")
+            await server.start()
+            print(f"Serving customer support sessions on http://{server.host}:{server.port} "
+                  f"with {args.shards} shards")
+            await server.serve_forever()
+        finally:
+            await manager.stop()
+    
+    try:
+        asyncio.run(run_server())
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped.")
+
+def serve(args: argparse.Namespace):
+    """Run the HTTP front end until interrupted"""
+    if args.shards:
+        serve_sharded(args)
+        return
+    store = TicketStore(args.ticket_db) if args.ticket_db else None
+    checkpoint = SessionCheckpoint(args.checkpoint) if args.checkpoint else None
+    manager = SessionManager(idle_timeout=args.idle_timeout, history=make_history(args),
+                             tickets=store, checkpoint=checkpoint)
+    if len(manager):
+        print(f"Restored {len(manager)} sessions from {args.checkpoint}")
+    server = SupportServer(manager, args.host, args.port, args.checkpoint_interval)
+    
+    async def run_server():
+        await server.start()
+        print(f"Serving customer support sessions on http://{server.host}:{server.port}")
+        await server.serve_forever()
+    
+    try:
+        asyncio.run(run_server())
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped.")
+    finally:
+        if store:
+            store.close()
+
+def bench_memory(sessions: int, messages: int) -> Dict:
+    """Traced allocation per session for ``sessions`` live conversations"""
+    texts = ["My internet keeps dropping", "technical", "high", "since this morning"]
+    manager = SessionManager()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for i in range(sessions):
+        session_id = f"session-{i}"
+        for m in range(messages):
+            # Distinct strings per session, as real customer messages would be
+            manager.process_message(session_id, f"{texts[m % len(texts)]} ({i})")
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    used = current - before
+    return {
+        'sessions': sessions,
+        'messages_per_session': messages,
+        'bytes': used,
+        'bytes_per_session': used / max(sessions, 1),
+        'peak_bytes': peak - before,
+        'messages_per_second': sessions * messages / elapsed if elapsed else 0.0
+    }
+
+def synthetic_chain(size: int) -> SupportChain:
+    """A linear chain of ``size`` steps cycling through the stock handlers"""
+    handlers = list(RESPONSE_HANDLERS)
+    steps = [{
+        'id': f"step-{i}",
+        'name': f"Step {i}",
+        'prompt': f"Synthetic step {i}.",
+        'system_prompt': f"Synthetic system prompt {i}.",
+        'handler': handlers[i % len(handlers)],
+        'slot': f"slot-{i}",
+        'next': {'default': f"step-{i + 1}"} if i + 1 < size else {}
+    } for i in range(size)]
+    return SupportChain(steps)
+
+def bench_chain(sizes: List[int], messages: int) -> List[Dict]:
+    """Time message handling on chains of increasing length"""
+    results = []
+    for size in sizes:
+        chain = synthetic_chain(size)
+        agent = CustomerSupportAI(pacing=False, chain=chain)
+        # Sessions start deep into the chain and are timed over whole cycles
+        # of the stock handlers, so every size dispatches the same mix of steps
+        cycle = len(RESPONSE_HANDLERS)
+        first = size // 2 // cycle * cycle
+        run = max(cycle, min(100, (size - first) // cycle * cycle))
+        elapsed = 0.0
+        for done in range(0, messages, run):
+            # Fresh sessions cost in proportion to the chain, so they are set
+            # up outside the timed region: only step dispatch is measured
+            agent.reset()
+            agent.state.step = first
+            start = time.perf_counter()
+            for _ in range(min(run, messages - done)):
+                agent.process_message("My account shows a billing error")
+            elapsed += time.perf_counter() - start
+        results.append({
+            'steps': size,
+            'messages': messages,
+            'us_per_message': elapsed / messages * 1e6
+        })
+    return results
+
+def classify_backlog(args: argparse.Namespace):
+    """Classify every ticket in a file (or stdin) in one batch"""
+    index = CATEGORY_INDEX
+    if args.keywords:
+        with open(args.keywords, encoding='utf-8') as f:
+            index = CategoryIndex(json.load(f))
+    if args.tickets == '-':
+        tickets = [line.rstrip('\n') for line in sys.stdin]
+    else:
+        with open(args.tickets, encoding='utf-8') as f:
+            tickets = [line.rstrip('\n') for line in f]
+    tickets = [ticket for ticket in tickets if ticket.strip()]
+    
+    start = time.perf_counter()
+    results = index.classify_batch(tickets)
+    elapsed = time.perf_counter() - start
+    if args.summary:
+        counts = dict.fromkeys(index.categories, 0)
+        for category, _ in results:
+            counts[category] += 1
+        print(json.dumps({'tickets': len(tickets), 'seconds': elapsed, 'categories': counts}))
+    else:
+        for ticket, (category, score) in zip(tickets, results):
+            print(json.dumps({'ticket': ticket, 'category': category, 'score': score}))
+
+def show_tickets(args: argparse.Namespace):
+    """Print tickets from a ticket database as JSON lines"""
+    store = TicketStore(args.db)
+    try:
+        if args.id is not None:
+            ticket = store.get(args.id)
+            rows = [ticket] if ticket else []
+        else:
+            rows = store.find(args.category, args.urgency, args.status, args.limit)
+        for row in rows:
+            print(json.dumps(row))
+    finally:
+        store.close()
+
+def bench_tickets(count: int, path: Optional[str] = None) -> Dict:
+    """Write ``count`` tickets from many sessions and time the commits"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TicketStore(path or os.path.join(tmp, 'tickets.db'))
+        data = {'issue': "Can't log in", 'category': 'Account', 'urgency': 'High',
+                'details': 'Password reset email never arrives', 'solution': 'Thanks'}
+        start = time.perf_counter()
+        for i in range(count):
+            store.save(store.allocate(), data, f"session-{i}")
+        store.flush()
+        elapsed = time.perf_counter() - start
+        commits = store.commits
+        store.close()
+    return {
+        'tickets': count,
+        'commits': commits,
+        'seconds': elapsed,
+        'tickets_per_second': count / elapsed if elapsed else 0.0
+    }
+
+def loadgen(args: argparse.Namespace) -> int:
+    """Run the load generator; returns the exit status"""
+    if args.transcripts:
+        transcripts = load_transcripts(args.transcripts)
+    else:
+        transcripts = synthetic_transcripts(min(args.sessions, 1000), args.seed)
+    store = None
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        store = TicketStore(args.ticket_db) if args.ticket_db else None
+        target = InProcessTarget(SessionManager(history=make_history(args), tickets=store))
+    
+    generator = LoadGenerator(target, transcripts, args.rate, args.think, args.seed)
+    try:
+        report = asyncio.run(generator.run(args.sessions))
+    finally:
+        if store:
+            store.close()
+    
+    failures = []
+    if args.max_p99_ms is not None and report['p99_ms'] > args.max_p99_ms:
+        failures.append(f"p99 {report['p99_ms']:.2f} ms > {args.max_p99_ms} ms")
+    if args.min_throughput is not None and report['messages_per_second'] < args.min_throughput:
+        failures.append(f"throughput {report['messages_per_second']:.0f}/s < {args.min_throughput}/s")
+    if report['errors']:
+        failures.append(f"{report['errors']} sessions failed")
+    report['failures'] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+def legacy_response(step: int, category: str, ticket: int) -> str:
+    """The inline f-string responses the templates replaced, for comparison"""
+    if step == 0:
+        return "Hello! Thank you for contacting our support team. I'm here to help you today. Could you please describe the issue you're experiencing?"
+    elif step == 1:
+        return f"I understand. This sounds like a {category.capitalize()} issue. Is that correct?"
+    elif step == 2:
+        return "Thank you for confirming. To help prioritize your request, could you tell me if this is preventing you from using our service completely, or is it something that can wait a bit?"
+    elif step == 3:
+        return "I appreciate those details. To help resolve this quickly, could you provide any error messages you're seeing, or when you first noticed this issue?"
+    import random
+    ticket = random.randint(1000, 9999)
+    return f"Based on everything you've shared, here's what I recommend: [Solution tailored to your issue]. I'll also create a ticket (#{ticket}) for our team to follow up. Is there anything else I can help you with today?"
+
+def bench_templates(messages: int) -> Dict:
+    """Blocks and bytes allocated per response, keeping every response alive
+    as a chat history would"""
+    categories = ['Technical', 'Billing', 'Account', 'General']
+    names = [step['id'] for step in STEPS]
+    
+    def templated(i: int) -> str:
+        step = i % len(names)
+        if step == 1:
+            return RESPONSE_TEMPLATES['categorize'].render(category=categories[i % 4])
+        if step == 4:
+            return RESPONSE_TEMPLATES['solution'].render(ticket=i)
+        return RESPONSE_TEMPLATES[names[step]].render()
+    
+    def legacy(i: int) -> str:
+        return legacy_response(i % len(names), categories[i % 4], i)
+    
+    results = {}
+    for label, respond in (('legacy', legacy), ('templates', templated)):
+        kept = [None] * messages
+        respond(0)  # Warm caches and imports outside the measurement
+        # Timed without tracemalloc, whose per-allocation hook would dominate
+        start = time.perf_counter()
+        for i in range(messages):
+            kept[i] = respond(i)
+        elapsed = time.perf_counter() - start
+        kept = [None] * messages
+        tracemalloc.start()
+        blocks = sys.getallocatedblocks()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(messages):
+            kept[i] = respond(i)
+        used = tracemalloc.get_traced_memory()[0] - before
+        blocks = sys.getallocatedblocks() - blocks
+        tracemalloc.stop()
+        results[label] = {
+            'blocks_per_message': blocks / messages,
+            'bytes_per_message': used / messages,
+            'us_per_message': elapsed / messages * 1e6
+        }
+        del kept
+    return results
+
+def bench_snapshot(sessions: int, changed: float) -> Dict:
+    """Time a full checkpoint, an incremental one and a cold restore"""
+    transcripts = synthetic_transcripts(1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sessions.ckpt')
+        manager = SessionManager(checkpoint=SessionCheckpoint(path))
+        for i in range(sessions):
+            for text in transcripts[i % len(transcripts)][:3]:
+                manager.process_message(f"session-{i}", text)
+        
+        start = time.perf_counter()
+        manager.checkpoint()
+        full = time.perf_counter() - start
+        size = os.path.getsize(path)
+        
+        touched = max(1, int(sessions * changed))
+        for i in range(touched):
+            manager.process_message(f"session-{i * (sessions // touched)}", "One more thing")
+        start = time.perf_counter()
+        written = manager.checkpoint()
+        incremental = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        restored = SessionManager(checkpoint=SessionCheckpoint(path))
+        restore = time.perf_counter() - start
+        assert len(restored) == sessions
+        
+        single = manager.sessions['session-0'].snapshot()
+        start = time.perf_counter()
+        for _ in range(10_000):
+            SessionState.restore(single)
+        single_restore = (time.perf_counter() - start) / 10_000
+    return {
+        'sessions': sessions,
+        'checkpoint_bytes': size,
+        'bytes_per_session': size / sessions,
+        'full_checkpoint_seconds': full,
+        'incremental_sessions': written,
+        'incremental_checkpoint_seconds': incremental,
+        'restore_seconds': restore,
+        'single_restore_us': single_restore * 1e6
+    }
+
+def bench_shards(workers: List[int], sessions: int, cpu_us: float) -> List[Dict]:
+    """Messages per second through the router for each worker count, plus
+    one live resize under load"""
+    transcripts = synthetic_transcripts(min(sessions, 1000))
+    
+    async def run(count: int) -> Dict:
+        manager = await ShardedSessionManager(count, cpu_us=cpu_us).start()
+        try:
+            rounds = len(transcripts[0])
+            start = time.perf_counter()
+            for turn in range(rounds):
+                await manager.process_batch([
+                    (f"session-{i}", transcripts[i % len(transcripts)][turn]) for i in range(sessions)
+                ])
+            elapsed = time.perf_counter() - start
+            # Rebalance onto one more worker while a round of messages is in flight
+            traffic = manager.process_batch([(f"session-{i}", "Anything else?") for i in range(sessions)])
+            resize_start = time.perf_counter()
+            moved, replies = await asyncio.gather(manager.resize(count + 1), traffic)
+            return {
+                'workers': count,
+                'messages': sessions * rounds,
+                'messages_per_second': sessions * rounds / elapsed,
+                'resize_moved_sessions': moved,
+                'resize_seconds': time.perf_counter() - resize_start,
+                'messages_during_resize': len(replies),
+                'sessions_after_resize': await manager.count()
+            }
+        finally:
+            await manager.stop()
+    
+    results = [asyncio.run(run(count)) for count in workers]
+    base = results[0]['messages_per_second'] / results[0]['workers']
+    for row in results:
+        row['scaling_efficiency'] = row['messages_per_second'] / (base * row['workers'])
+    return results
+
 def main():
     """Entry point"""
+    args = parse_args()
+    if args.command == 'serve':
+        serve(args)
+        return
+    if args.command == 'bench-memory':
+        print(json.dumps(bench_memory(args.sessions, args.messages), indent=2))
+        return
+    if args.command == 'classify':
+        classify_backlog(args)
+        return
+    if args.command == 'loadgen':
+        sys.exit(loadgen(args))
+    if args.command == 'bench-templates':
+        print(json.dumps(bench_templates(args.messages), indent=2))
+        return
+    if args.command == 'bench-snapshot':
+        print(json.dumps(bench_snapshot(args.sessions, args.changed), indent=2))
+        return
+    if args.command == 'bench-shards':
+        for row in bench_shards(args.workers, args.sessions, args.cpu_us):
+            print(json.dumps(row))
+        return
+    if args.command == 'tickets':
+        show_tickets(args)
+        return
+    if args.command == 'bench-tickets':
+        print(json.dumps(bench_tickets(args.count, args.db), indent=2))
+        return
+    if args.command == 'bench-chain':
+        for row in bench_chain(args.sizes, args.messages):
+            print(json.dumps(row))
+        return
+    
+    store = TicketStore(args.ticket_db) if args.ticket_db else None
     try:
-        app = CustomerSupportAI()
+        app = CustomerSupportAI(history=make_history(args),
+                                history_display=args.history_display, tickets=store)
         app.run()
     except KeyboardInterrupt:
         print("\n\n👋 Interrupted. Goodbye!")
     except Exception as e:
         print(f"\n❌ Error: {e}")
+    finally:
+        if store:
+            store.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,15 +1,565 @@
 import os
+import re
+import sys
+import json
+import math
 import time
-from typing import Dict, List
+import heapq
+import argparse
+import multiprocessing
+from array import array
+from collections import Counter, deque
+from io import StringIO
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple, Union
 
-class SelfReflectionAI:
+from terminal_renderer import TerminalRenderer
+
+try:
+    import numpy as np
+except ImportError:  # Sentence scoring falls back to pure Python
+    np = None
+
+class Sentence:
+    """A sentence as a span of a shared text buffer; the text is only
+    sliced out when asked for"""
+    
+    __slots__ = ('buffer', 'start', 'end', 'offset')
+    
+    def __init__(self, buffer: str, start: int, end: int, offset: int):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        # Position of ``start`` in the whole document
+        self.offset = offset
+    
+    @property
+    def text(self) -> str:
+        text = self.buffer[self.start:self.end]
+        # Lines of a pasted paragraph read as one sentence
+        return ' '.join(text.split()) if '\n' in text else text
+    
+    def __len__(self) -> int:
+        return self.end - self.start
+    
+    def __str__(self) -> str:
+        return self.text
+    
+    def __repr__(self) -> str:
+        return f"Sentence({self.offset}, {self.text!r})"
+
+class SentenceSegmenter:
+    """Split text into sentences in one streaming pass.
+    
+    Input is read ``chunk_size`` characters at a time into a rolling
+    buffer; every sentence found is yielded as a Sentence span of that
+    buffer, and text before the current sentence is dropped when the next
+    chunk arrives, so memory stays bounded by the chunk size plus the
+    longest sentence. A sentence ends at ``.``, ``!`` or ``?`` (plus any
+    closing quotes or brackets) followed by whitespace, or at a blank
+    line. Known abbreviations, initials and decimals do not end sentences.
+    """
+    
+    ABBREVIATIONS = frozenset({
+        'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc', 'e.g', 'i.e',
+        'inc', 'ltd', 'co', 'corp', 'fig', 'approx', 'dept', 'est', 'jan', 'feb',
+        'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec', 'u.s',
+        'u.k', 'a.m', 'p.m', 'al', 'cf', 'mt', 'ft', 'vol', 'ed', 'gen', 'gov', 'rev'
+    })
+    TERMINATORS = '.!?'
+    CLOSERS = '\'")]\u2019\u201d'
+    BOUNDARY = re.compile(r'[.!?]+[\'")\]\u2019\u201d]*(?=\s)|\n[ \t]*\n')
+    WORD_BEFORE = re.compile(r'([\w.]+)\.$')
+    
+    def __init__(self, chunk_size: int = 1 << 16, abbreviations: Optional[frozenset] = None):
+        self.chunk_size = chunk_size
+        self.abbreviations = self.ABBREVIATIONS if abbreviations is None else abbreviations
+    
+    def _is_abbreviation(self, buffer: str, start: int, end: int) -> bool:
+        if buffer[end - 1] != '.' or end - start > 1 and buffer[end - 2] in '.!?':
+            return False
+        match = self.WORD_BEFORE.search(buffer, max(start, end - 16), end)
+        if match is None:
+            return False
+        word = match.group(1).lower()
+        # Single initials ("J. Smith") and listed abbreviations
+        return len(word) == 1 and word.isalpha() or word in self.abbreviations
+    
+    def segment(self, source: Union[str, TextIO]) -> Iterator[Sentence]:
+        """Yield the sentences of a string or a readable text stream"""
+        stream = StringIO(source) if isinstance(source, str) else source
+        buffer = ''
+        base = 0      # Document offset of buffer[0]
+        start = 0     # Start of the sentence being built
+        scan = 0      # Where to resume looking for a boundary
+        eof = False
+        while not eof:
+            chunk = stream.read(self.chunk_size)
+            eof = not chunk
+            if chunk:
+                if start:
+                    # Forget everything before the current sentence
+                    base += start
+                    buffer = buffer[start:] + chunk
+                    scan -= start
+                    start = 0
+                else:
+                    buffer += chunk
+            
+            while True:
+                match = self.BOUNDARY.search(buffer, scan)
+                # A boundary touching the end of the buffer may still grow
+                if match is None or not eof and match.end() >= len(buffer) - 1:
+                    scan = match.start() if match else self._resume(buffer, max(start, scan))
+                    break
+                scan = match.end()
+                end = match.end() if match.group()[0] != '\n' else match.start()
+                if self._is_abbreviation(buffer, start, end):
+                    continue
+                sentence = self._span(buffer, start, end, base)
+                if sentence:
+                    yield sentence
+                start = scan
+        
+        sentence = self._span(buffer, start, len(buffer), base)
+        if sentence:
+            yield sentence
+    
+    def _resume(self, buffer: str, floor: int) -> int:
+        """Where to look for a boundary once more text arrives: the start of
+        a trailing run that the next chunk could complete (``?"`` awaiting
+        its space, or a newline awaiting the blank line), else the end"""
+        end = len(buffer)
+        i = end
+        while i > floor and buffer[i - 1] in self.CLOSERS:
+            i -= 1
+        terminators = i
+        while i > floor and buffer[i - 1] in self.TERMINATORS:
+            i -= 1
+        if i < terminators:
+            return i
+        i = end
+        while i > floor and buffer[i - 1] in ' \t':
+            i -= 1
+        if i > floor and buffer[i - 1] == '\n':
+            return i - 1
+        return end
+    
+    @staticmethod
+    def _span(buffer: str, start: int, end: int, base: int) -> Optional[Sentence]:
+        while start < end and buffer[start].isspace():
+            start += 1
+        while end > start and buffer[end - 1].isspace():
+            end -= 1
+        return Sentence(buffer, start, end, base + start) if end > start else None
+
+SEGMENTER = SentenceSegmenter()
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have he her
+his i if in into is it its it's me my no not of on or our she so than that the their
+them then there these they this those to too us was we were what when which who will
+with would you your
+""".split())
+
+def int_view(values: array):
+    """Zero-copy numpy view of an integer ``array``"""
+    return np.frombuffer(values, dtype=f'i{values.itemsize}')
+
+class TermWeights:
+    """Vocabulary and IDF table shared by every document a summarizer sees.
+    
+    Term ids are assigned once and reused, so batch runs never rebuild the
+    vocabulary. Documents added with ``add_document`` feed corpus-level
+    document frequencies; the table can be saved and loaded as JSON.
+    """
+    
     def __init__(self):
-        self.current_iteration = 0
+        self.vocabulary: Dict[str, int] = {}
+        # Term of each id
+        self.terms: List[str] = []
+        self.document_frequency = array('l')
+        self.documents = 0
+        self._idf = None
+    
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+    
+    def term_id(self, term: str) -> int:
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            term_id = self.vocabulary[term] = len(self.vocabulary)
+            self.terms.append(term)
+            self.document_frequency.append(0)
+        return term_id
+    
+    def add_document(self, term_ids: Iterable[int]):
+        """Count one document containing each of ``term_ids``"""
+        frequency = self.document_frequency
+        for term_id in set(term_ids):
+            frequency[term_id] += 1
+        self.documents += 1
+        self._idf = None
+    
+    def idf(self):
+        """Smoothed IDF per term id (numpy array when available)"""
+        if self._idf is None or len(self._idf) != len(self.vocabulary):
+            total = self.documents
+            if np is not None:
+                df = int_view(self.document_frequency)
+                self._idf = np.log((1 + total) / (1 + df)) + 1
+            else:
+                self._idf = [math.log((1 + total) / (1 + df)) + 1 for df in self.document_frequency]
+        return self._idf
+    
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'documents': self.documents,
+                       'terms': self.terms,
+                       'document_frequency': list(self.document_frequency)}, f)
+    
+    @classmethod
+    def load(cls, path: str) -> 'TermWeights':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        weights = cls()
+        weights.terms = data['terms']
+        weights.vocabulary = {term: i for i, term in enumerate(weights.terms)}
+        weights.document_frequency = array('l', data['document_frequency'])
+        weights.documents = data['documents']
+        return weights
+
+class ExtractiveSummarizer:
+    """Pick the sentences closest to the document's TF-IDF centroid.
+    
+    Sentences become rows of a sparse term/sentence matrix in CSR form
+    (term counts, term ids and row offsets), built while the document is
+    segmented; only the text of each sentence is kept, never the
+    segmenter's buffers. Terms are weighted by the
+    corpus IDF when the shared TermWeights have seen documents, otherwise
+    by IDF across the document's own sentences. Each row is scored by
+    cosine similarity to the centroid of all rows, and the top ``k`` are
+    returned in document order. Scoring is vectorized with numpy when it is
+    installed and done row by row otherwise.
+    """
+    
+    TOKEN = re.compile(r"[a-z0-9][a-z0-9']*")
+    
+    def __init__(self, weights: Optional[TermWeights] = None, learn: bool = False):
+        self.weights = weights if weights is not None else TermWeights()
+        # Whether every document read also updates the corpus frequencies
+        self.learn = learn
+    
+    def matrix(self, texts: Iterable[str]) -> Tuple[array, array, array]:
+        """CSR ``(counts, term_ids, row_offsets)`` for the sentence texts"""
+        counts, term_ids, offsets = array('d'), array('l'), array('l', [0])
+        term_id = self.weights.term_id
+        findall = self.TOKEN.findall
+        for text in texts:
+            terms = Counter(findall(text.lower()))
+            for term, count in terms.items():
+                if term not in STOPWORDS:
+                    term_ids.append(term_id(term))
+                    counts.append(count)
+            offsets.append(len(term_ids))
+        return counts, term_ids, offsets
+    
+    def read(self, source: Union[str, TextIO]) -> Tuple[List[str], Tuple[array, array, array]]:
+        """Segment a document in one streaming pass, returning its sentence
+        texts and their CSR matrix"""
+        texts: List[str] = []
+        
+        def collect() -> Iterator[str]:
+            for sentence in SEGMENTER.segment(source):
+                text = sentence.text
+                texts.append(text)
+                yield text
+        
+        matrix = self.matrix(collect())
+        if self.learn:
+            # Counted here, so documents too short to need scoring are learned too
+            self.weights.add_document(matrix[1])
+        return texts, matrix
+    
+    def term_totals(self, matrix: Tuple[array, array, array]) -> Dict[str, float]:
+        """How often each (non-stopword) term occurs in the whole document"""
+        counts, term_ids, _ = matrix
+        totals: Dict[int, float] = {}
+        for term_id, count in zip(term_ids, counts):
+            totals[term_id] = totals.get(term_id, 0.0) + count
+        terms = self.weights.terms
+        return {terms[term_id]: total for term_id, total in totals.items()}
+    
+    def scores(self, matrix: Tuple[array, array, array]) -> List[float]:
+        """Centroid similarity of every sentence (row) of ``matrix``"""
+        counts, term_ids, offsets = matrix
+        # With ``learn`` set, read() has already counted this document
+        corpus = self.weights.documents > (1 if self.learn else 0)
+        if not term_ids:
+            return [0.0] * (len(offsets) - 1)
+        if np is not None:
+            return self._scores_numpy(counts, term_ids, offsets, corpus)
+        return self._scores_python(counts, term_ids, offsets, corpus)
+    
+    def _scores_numpy(self, counts, term_ids, offsets, corpus: bool) -> List[float]:
+        data = np.frombuffer(counts, dtype=np.float64)
+        ids = int_view(term_ids)
+        offsets = int_view(offsets)
+        rows = len(offsets) - 1
+        if corpus:
+            idf = self.weights.idf()
+        else:
+            df = np.bincount(ids, minlength=len(self.weights))
+            idf = np.log((1 + rows) / (1 + df)) + 1
+        weighted = data * idf[ids]
+        centroid = np.bincount(ids, weights=weighted, minlength=len(self.weights))
+        # Row sums via cumulative sums, which also copes with empty rows
+        def row_sums(values):
+            totals = np.concatenate(([0.0], np.cumsum(values)))
+            return totals[offsets[1:]] - totals[offsets[:-1]]
+        dots = row_sums(weighted * centroid[ids])
+        norms = np.sqrt(row_sums(weighted * weighted)) * np.sqrt(centroid @ centroid)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(norms > 0, dots / norms, 0.0).tolist()
+    
+    def _scores_python(self, counts, term_ids, offsets, corpus: bool) -> List[float]:
+        rows = len(offsets) - 1
+        if corpus:
+            idf = self.weights.idf()
+            weight = lambda term: idf[term]
+        else:
+            df = Counter(term_ids)
+            weight = lambda term: math.log((1 + rows) / (1 + df[term])) + 1
+        weighted = array('d', (count * weight(term) for count, term in zip(counts, term_ids)))
+        centroid: Dict[int, float] = {}
+        for value, term in zip(weighted, term_ids):
+            centroid[term] = centroid.get(term, 0.0) + value
+        centroid_norm = math.sqrt(sum(value * value for value in centroid.values()))
+        scores = []
+        for row in range(rows):
+            start, end = offsets[row], offsets[row + 1]
+            dot = sum(weighted[i] * centroid[term_ids[i]] for i in range(start, end))
+            norm = math.sqrt(sum(weighted[i] * weighted[i] for i in range(start, end)))
+            scores.append(dot / (norm * centroid_norm) if norm and centroid_norm else 0.0)
+        return scores
+    
+    def select(self, texts: List[str], k: int,
+               matrix: Optional[Tuple[array, array, array]] = None) -> List[str]:
+        """The ``k`` best sentences, in document order"""
+        if len(texts) <= k:
+            return list(texts)
+        scores = self.scores(matrix if matrix is not None else self.matrix(texts))
+        if np is not None:
+            best = np.argpartition(-np.asarray(scores), k - 1)[:k].tolist()
+        else:
+            best = heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+        return [texts[i] for i in sorted(best)]
+    
+    def summarize(self, source: Union[str, TextIO], k: int = 2) -> List[str]:
+        texts, matrix = self.read(source)
+        return self.select(texts, k, matrix)
+    
+    def fit(self, source: Union[str, TextIO]):
+        """Add one document to the corpus frequencies without summarizing it"""
+        _, term_ids, _ = self.matrix(sentence.text for sentence in SEGMENTER.segment(source))
+        self.weights.add_document(term_ids)
+
+class ConvergenceTracker:
+    """Measure how much each reflection iteration changed.
+    
+    Summary similarity is the Jaccard index of the token sets of two
+    consecutive summaries. The last summary's token set is kept; when the
+    new summary wraps it unchanged (text added before or after it, as
+    ``improve_summary`` does), only the added text is tokenized. Critique
+    change is the fraction of criteria whose verdict changed. The loop has
+    converged once either change is within ``1 - threshold``.
+    """
+    
+    TOKEN = ExtractiveSummarizer.TOKEN
+    
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = threshold
+        self.reset()
+    
+    def reset(self):
+        self._summary = ""
+        self._tokens: frozenset = frozenset()
+        self._critique: Optional[Dict[str, str]] = None
+        self.similarities: List[float] = []
+        self.critique_changes: List[float] = []
+    
+    def _tokenize(self, text: str) -> frozenset:
+        return frozenset(self.TOKEN.findall(text.lower()))
+    
+    @staticmethod
+    def _joins(left: str, right: str) -> bool:
+        return (left.isalnum() or left == "'") and (right.isalnum() or right == "'")
+    
+    def _tokens_of(self, summary: str) -> frozenset:
+        previous = self._summary
+        at = summary.find(previous) if previous else -1
+        end = at + len(previous)
+        # Reuse the previous tokens only if no word straddles the seams
+        if at >= 0 and not (at and self._joins(summary[at - 1], previous[0])) \
+                and not (end < len(summary) and self._joins(previous[-1], summary[end])):
+            return self._tokens | self._tokenize(summary[:at]) | self._tokenize(summary[end:])
+        return self._tokenize(summary)
+    
+    def summary_similarity(self, summary: str) -> float:
+        """Similarity of ``summary`` to the previous one (0.0 for the first)"""
+        tokens = self._tokens_of(summary)
+        union = len(tokens | self._tokens)
+        similarity = len(tokens & self._tokens) / union if union and self._summary else 0.0
+        if self._summary:
+            self.similarities.append(similarity)
+        self._summary, self._tokens = summary, tokens
+        return similarity
+    
+    def critique_change(self, critique: Dict[str, str]) -> float:
+        """Fraction of criteria judged differently than last time (1.0 for the first)"""
+        previous = self._critique
+        self._critique = critique
+        if previous is None:
+            return 1.0
+        keys = previous.keys() | critique.keys()
+        change = sum(previous.get(key) != critique.get(key) for key in keys) / len(keys) if keys else 0.0
+        self.critique_changes.append(change)
+        return change
+    
+    def converged(self, change: float) -> bool:
+        return self.threshold is not None and change <= 1 - self.threshold
+
+# Words that pad a summary without adding information
+FILLER_WORDS = frozenset("""
+actually additional additionally also basically clear comprehensive essentially
+generally just more now overall providing quite really simply that various very well
+""".split())
+
+class CritiqueEngine:
+    """Score a summary against the reflection criteria sentence by sentence.
+    
+    Every sentence gets a score per criterion, cached by its text, so an
+    improved summary only costs the sentences that are new or edited. When
+    the new summary wraps the previous one at sentence boundaries (as
+    ``improve_summary`` does), only the added text is even segmented and
+    the previous totals are carried over. Scores are aggregated weighted by
+    sentence length and turned into the verdicts shown in the UI; positive
+    verdicts say "good" or "clear", which is what the icons look for.
+    """
+    
+    CRITERIA = ("Clarity", "Completeness", "Conciseness", "Accuracy", "Structure")
+    # Verdicts per criterion from weak to strong
+    VERDICTS = {
+        "Clarity": ("Somewhat clear but could be more direct",
+                    "Much clearer with better word choice",
+                    "Excellent clarity and readability"),
+        "Completeness": ("Missing some important details from the original",
+                         "Better coverage but still missing minor points",
+                         "Comprehensive coverage of all key points"),
+        "Conciseness": ("Good length but could be more focused",
+                        "Well-balanced length",
+                        "Perfectly concise without sacrificing meaning"),
+        "Accuracy": ("Accurate but lacks specific examples",
+                     "More accurate with added specifics",
+                     "Highly accurate with precise details"),
+        "Structure": ("Basic structure, could improve logical flow",
+                      "Improved flow and organization",
+                      "Well-structured and logically organized"),
+    }
+    KEY_TERMS = 10
+    TOKEN = ExtractiveSummarizer.TOKEN
+    
+    def __init__(self):
+        self.vocabulary: frozenset = frozenset()
+        self.key_terms: frozenset = frozenset()
+        # Sentence text -> (word count, clarity, conciseness, accuracy, structure, key terms)
+        self.cache: Dict[str, Tuple] = {}
+        self.scored = 0
+        self.reused = 0
+        self._summary = ""
+        self._totals: Optional[List[float]] = None
+        self._covered: frozenset = frozenset()
+    
+    def study(self, term_totals: Dict[str, float]):
+        """Learn the original document's vocabulary and key terms from its
+        term counts (see ``ExtractiveSummarizer.term_totals``)"""
+        self.vocabulary = frozenset(term_totals) | STOPWORDS
+        key_terms = heapq.nlargest(self.KEY_TERMS, (term for term in term_totals if term not in STOPWORDS),
+                                   key=term_totals.__getitem__)
+        self.key_terms = frozenset(key_terms)
+        self.cache.clear()
+        self._summary, self._totals = "", None
+    
+    def _score(self, text: str) -> Tuple:
+        scores = self.cache.get(text)
+        if scores is not None:
+            self.reused += 1
+            return scores
+        self.scored += 1
+        words = self.TOKEN.findall(text.lower())
+        count = len(words) or 1
+        long_words = sum(len(word) > 12 for word in words)
+        clarity = min(1.0, 20 / count) * (1 - long_words / count)
+        conciseness = 1 - sum(word in FILLER_WORDS for word in words) / count
+        content = [word for word in words if word not in STOPWORDS] or words
+        accuracy = sum(word in self.vocabulary for word in content) / len(content) if content else 0.0
+        structure = 0.5 * text[:1].isupper() + 0.5 * (text[-1:] in ('.', '!', '?'))
+        scores = self.cache[text] = (count, clarity, conciseness, accuracy, structure,
+                                     self.key_terms.intersection(words))
+        return scores
+    
+    def _added_texts(self, summary: str) -> Optional[List[str]]:
+        """Sentences added around the previous summary, or None if it was edited"""
+        previous = self._summary
+        at = summary.find(previous) if previous else -1
+        if at < 0:
+            return None
+        before, after = summary[:at], summary[at + len(previous):]
+        # The additions must end and start at sentence boundaries
+        if before and not (before[-1].isspace() and before.rstrip()[-1:] in ('.', '!', '?')):
+            return None
+        if after and not after[0].isspace():
+            return None
+        return [sentence.text for part in (before, after) for sentence in SEGMENTER.segment(part)]
+    
+    def critique(self, summary: str) -> Dict[str, str]:
+        added = self._added_texts(summary) if self._totals is not None else None
+        if added is None:
+            texts = [sentence.text for sentence in SEGMENTER.segment(summary)]
+            totals, covered = [0.0] * 5, frozenset()
+        else:
+            texts = added
+            totals, covered = list(self._totals), self._covered
+        for text in texts:
+            count, *values, terms = self._score(text)
+            totals[0] += count
+            for i, value in enumerate(values, 1):
+                totals[i] += value * count
+            covered = covered | terms
+        self._summary, self._totals, self._covered = summary, totals, covered
+        
+        words = totals[0] or 1
+        clarity, conciseness, accuracy, structure = (total / words for total in totals[1:])
+        completeness = len(covered) / len(self.key_terms) if self.key_terms else 1.0
+        scores = dict(zip(self.CRITERIA, (clarity, completeness, conciseness, accuracy, structure)))
+        return {criterion: self.VERDICTS[criterion][0 if score < 0.5 else 1 if score < 0.8 else 2]
+                for criterion, score in scores.items()}
+
+# Longest stretch of the original text drawn in the UI
+PREVIEW_CHARS = 2000
+
+class SelfReflectionAI:
+    def __init__(self, interactive: bool = True,
+                 summarizer: Optional[ExtractiveSummarizer] = None, summary_sentences: int = 2,
+                 converge: Optional[float] = None):
+        # Headless runs skip the UI, the prompts and the simulated delays
+        self.interactive = interactive
+        # Shared across documents so its vocabulary and IDF table are reused
+        self.summarizer = summarizer or ExtractiveSummarizer()
+        self.summary_sentences = summary_sentences
+        # Stop early once an iteration changes the summary or critique less than this allows
+        self.convergence = ConvergenceTracker(converge)
+        self.renderer = TerminalRenderer()
         self.max_iterations = 3
-        self.original_text = ""
-        self.summaries = []
-        self.critiques = []
-        self.improvements = []
         
         self.reflection_criteria = [
             "Clarity - Is the summary easy to understand?",
@@ -18,10 +568,42 @@ class SelfReflectionAI:
             "Accuracy - Does it faithfully represent the original?",
             "Structure - Is it well-organized?"
         ]
+        self.reset()
+    
+    def reset(self):
+        """Forget the current document, keeping the settings and the shared summarizer"""
+        self.convergence.reset()
+        # Caches sentence scores, so later iterations only critique what changed
+        self.critic = CritiqueEngine()
+        self.converged_at: Optional[int] = None
+        self.iteration_seconds: List[float] = []
+        self.current_iteration = 0
+        self.original_text = ""
+        # What gets summarized: the text itself or a stream of it
+        self.source: Union[str, TextIO] = ""
+        self.summaries = []
+        self.critiques = []
+        self.improvements = []
+    
+    def pause(self, seconds: float):
+        """Sleep to simulate thinking in interactive mode"""
+        if self.interactive:
+            time.sleep(seconds)
+    
+    def announce(self, message: str):
+        """Print a progress message in interactive mode"""
+        if self.interactive:
+            print(message)
+    
+    def wait_for_user(self, prompt: str) -> str:
+        """Prompt in interactive mode; headless runs carry straight on"""
+        if self.interactive:
+            return input(prompt)
+        return ""
     
     def clear_screen(self):
         """Clear the console screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        self.renderer.clear()
     
     def print_header(self):
         """Print the application header"""
@@ -60,13 +642,16 @@ class SelfReflectionAI:
         if self.original_text:
             print("📄 ORIGINAL TEXT:")
             print("-" * 80)
-            print(self.original_text)
+            if len(self.original_text) > PREVIEW_CHARS:
+                print(self.original_text[:PREVIEW_CHARS] + " …")
+            else:
+                print(self.original_text)
             print("-" * 80)
             print()
     
     def print_current_summary(self):
         """Display the current summary"""
-        if self.summaries and self.current_iteration > 0:
+        if len(self.summaries) >= self.current_iteration > 0:
             idx = self.current_iteration - 1
             print(f"📝 SUMMARY (Iteration {self.current_iteration}):")
             print("-" * 80)
@@ -76,7 +661,7 @@ class SelfReflectionAI:
     
     def print_critique(self):
         """Display the critique"""
-        if self.critiques and self.current_iteration > 0:
+        if len(self.critiques) >= self.current_iteration > 0:
             idx = self.current_iteration - 1
             print(f"🔍 SELF-CRITIQUE (Iteration {self.current_iteration}):")
             print("-" * 80)
@@ -88,7 +673,7 @@ class SelfReflectionAI:
     
     def print_improvements(self):
         """Display identified improvements"""
-        if self.improvements and self.current_iteration > 0:
+        if len(self.improvements) >= self.current_iteration > 0:
             idx = self.current_iteration - 1
             print(f"💡 IDENTIFIED IMPROVEMENTS (Iteration {self.current_iteration}):")
             print("-" * 80)
@@ -111,58 +696,32 @@ class SelfReflectionAI:
     
     def display_ui(self):
         """Display the complete UI"""
-        self.clear_screen()
-        self.print_header()
-        self.print_iteration_progress()
-        self.print_original_text()
-        self.print_current_summary()
-        self.print_critique()
-        self.print_improvements()
-    
-    def generate_initial_summary(self, text: str) -> str:
+        if not self.interactive:
+            return
+        with self.renderer.frame():
+            self.print_header()
+            self.print_iteration_progress()
+            self.print_original_text()
+            self.print_current_summary()
+            self.print_critique()
+            self.print_improvements()
+    
+    def generate_initial_summary(self, text: Union[str, TextIO]) -> str:
         """Generate the initial summary"""
-        # Simple extractive summary - take first few sentences and key points
-        sentences = text.split('. ')
+        # Extractive summary - the few sentences that best represent the text
+        texts, matrix = self.summarizer.read(text)
+        self.critic.study(self.summarizer.term_totals(matrix))
         
-        # For demo purposes, create a deliberately improvable summary
-        if len(sentences) > 3:
-            summary = '. '.join(sentences[:2]) + '.'
-        else:
-            summary = text
+        # For demo purposes, keep the summary short enough to improve on
+        if len(texts) > 3:
+            texts = self.summarizer.select(texts, self.summary_sentences, matrix)
         
-        return summary
+        return ' '.join(texts)
     
     def generate_critique(self, summary: str, iteration: int) -> Dict[str, str]:
         """Generate self-critique based on reflection criteria"""
-        critique = {}
-        
-        # Simulate different critiques based on iteration
-        if iteration == 1:
-            critique = {
-                "Clarity": "Somewhat clear but could be more direct",
-                "Completeness": "Missing some important details from the original",
-                "Conciseness": "Good length but could be more focused",
-                "Accuracy": "Accurate but lacks specific examples",
-                "Structure": "Basic structure, could improve logical flow"
-            }
-        elif iteration == 2:
-            critique = {
-                "Clarity": "Much clearer with better word choice",
-                "Completeness": "Better coverage but still missing minor points",
-                "Conciseness": "Well-balanced length",
-                "Accuracy": "More accurate with added specifics",
-                "Structure": "Improved flow and organization"
-            }
-        else:
-            critique = {
-                "Clarity": "Excellent clarity and readability",
-                "Completeness": "Comprehensive coverage of all key points",
-                "Conciseness": "Perfectly concise without sacrificing meaning",
-                "Accuracy": "Highly accurate with precise details",
-                "Structure": "Well-structured and logically organized"
-            }
-        
-        return critique
+        # Only sentences not seen in earlier iterations are scored again
+        return self.critic.critique(summary)
     
     def generate_improvements(self, critique: Dict[str, str], iteration: int) -> List[str]:
         """Generate list of improvements based on critique"""
@@ -209,49 +768,135 @@ class SelfReflectionAI:
     
     def reflection_cycle(self):
         """Execute one complete reflection cycle"""
-        print(f"\n{'='*80}")
-        print(f"🔄 ITERATION {self.current_iteration}")
-        print(f"{'='*80}\n")
+        self.announce(f"\n{'='*80}")
+        self.announce(f"🔄 ITERATION {self.current_iteration}")
+        self.announce(f"{'='*80}\n")
         
         # Step 1: Generate/Improve Summary
         if self.current_iteration == 1:
-            print("📝 Generating initial summary...")
-            time.sleep(1)
-            summary = self.generate_initial_summary(self.original_text)
+            self.announce("📝 Generating initial summary...")
+            self.pause(1)
+            summary = self.generate_initial_summary(self.source)
         else:
-            print("📝 Generating improved summary based on feedback...")
-            time.sleep(1)
+            self.announce("📝 Generating improved summary based on feedback...")
+            self.pause(1)
             previous_summary = self.summaries[-1]
             previous_improvements = self.improvements[-1]
             summary = self.improve_summary(previous_summary, previous_improvements)
         
+        # A summary that barely moved would only get the same critique again
+        similarity = self.convergence.summary_similarity(summary)
+        if self.current_iteration > 1 and self.convergence.converged(1 - similarity):
+            self.announce(f"\n✅ Converged: summary {similarity:.0%} similar to the previous one")
+            self.converged_at = self.current_iteration - 1
+            return False
+        
         self.summaries.append(summary)
         self.display_ui()
-        input("\nPress Enter to generate self-critique...")
+        self.wait_for_user("\nPress Enter to generate self-critique...")
         
         # Step 2: Generate Critique
-        print("\n🔍 Analyzing summary and generating critique...")
-        time.sleep(1)
+        self.announce("\n🔍 Analyzing summary and generating critique...")
+        self.pause(1)
         critique = self.generate_critique(summary, self.current_iteration)
         self.critiques.append(critique)
+        critique_change = self.convergence.critique_change(critique)
         self.display_ui()
-        input("\nPress Enter to identify improvements...")
+        self.wait_for_user("\nPress Enter to identify improvements...")
         
         # Step 3: Identify Improvements
-        print("\n💡 Identifying areas for improvement...")
-        time.sleep(1)
+        self.announce("\n💡 Identifying areas for improvement...")
+        self.pause(1)
         improvements = self.generate_improvements(critique, self.current_iteration)
         self.improvements.append(improvements)
         self.display_ui()
         
+        # An unchanged critique leads to the same improvements
+        if self.current_iteration > 1 and self.convergence.converged(critique_change):
+            self.announce(f"\n✅ Converged: critique {1 - critique_change:.0%} unchanged")
+            self.converged_at = self.current_iteration
+            return False
+        
         # Check if we should continue
         if self.current_iteration < self.max_iterations:
-            response = input(f"\nPress Enter to continue to Iteration {self.current_iteration + 1} (or type 'stop' to finish): ").strip().lower()
+            response = self.wait_for_user(f"\nPress Enter to continue to Iteration {self.current_iteration + 1} (or type 'stop' to finish): ").strip().lower()
             if response == 'stop':
                 return False
         
         return True
     
+    def reflect(self, source: Union[str, TextIO], preview: Optional[str] = None) -> str:
+        """Run the reflection iterations over one document; returns the final summary"""
+        self.reset()
+        self.source = source
+        self.original_text = source if isinstance(source, str) else (preview or "")
+        
+        # Run reflection cycles
+        self.current_iteration = 1
+        while self.current_iteration <= self.max_iterations:
+            started = time.perf_counter()
+            continue_reflection = self.reflection_cycle()
+            self.iteration_seconds.append(time.perf_counter() - started)
+            
+            if not continue_reflection:
+                break
+            
+            self.current_iteration += 1
+        
+        # Point the UI at the last iteration that actually ran
+        self.current_iteration = len(self.summaries)
+        return self.summaries[-1]
+    
+    def convergence_stats(self) -> Dict[str, Any]:
+        """Iterations run and the time early exit saved, estimated from the
+        cost of the iterations that did run"""
+        completed = len(self.summaries)
+        skipped = self.max_iterations - completed if self.converged_at else 0
+        per_iteration = sum(self.iteration_seconds[:completed]) / completed if completed else 0.0
+        return {'iterations': completed,
+                'converged_at': self.converged_at,
+                'summary_similarity': [round(value, 4) for value in self.convergence.similarities],
+                'critique_change': [round(value, 4) for value in self.convergence.critique_changes],
+                'seconds': round(sum(self.iteration_seconds), 6),
+                'seconds_saved': round(per_iteration * skipped, 6)}
+    
+    def trail(self) -> List[Dict[str, Any]]:
+        """Summary, critique and improvements of every iteration that ran"""
+        return [{'iteration': i,
+                 'summary': summary,
+                 'critique': critique,
+                 'improvements': improvements}
+                for i, (summary, critique, improvements)
+                in enumerate(zip(self.summaries, self.critiques, self.improvements), 1)]
+    
+    def print_report(self):
+        """Show the summary evolution and the final result"""
+        self.display_ui()
+        self.print_comparison()
+        
+        print("\n" + "="*80)
+        print("✅ REFLECTION PROCESS COMPLETE!")
+        print("="*80)
+        print(f"\nFinal Summary (Version {len(self.summaries)}):")
+        print("-" * 80)
+        print(self.summaries[-1])
+        print("-" * 80)
+        
+        print("\n💡 Key Improvements Made:")
+        all_improvements = []
+        for imp_list in self.improvements:
+            all_improvements.extend(imp_list)
+        unique_improvements = list(set(all_improvements))
+        for i, imp in enumerate(unique_improvements[:5], 1):
+            print(f"   {i}. {imp}")
+        
+        if self.converged_at:
+            stats = self.convergence_stats()
+            print(f"\n🎯 Converged after {stats['iterations']} of {self.max_iterations} iterations "
+                  f"(about {stats['seconds_saved']:.2f}s saved)")
+        
+        print("\n" + "="*80)
+    
     def run(self):
         """Main application loop"""
         self.clear_screen()
@@ -273,7 +918,9 @@ class SelfReflectionAI:
             print("📄 Enter the text you want to summarize (or 'quit' to exit):")
             print("(You can paste multiple lines. Type 'END' on a new line when done)\n")
             
-            lines = []
+            # Lines are written into one buffer; the segmenter treats line
+            # breaks inside a paragraph as spaces
+            pasted = StringIO()
             while True:
                 line = input()
                 if line.strip().lower() == 'quit':
@@ -281,68 +928,228 @@ class SelfReflectionAI:
                     return
                 if line.strip().upper() == 'END':
                     break
-                lines.append(line)
+                pasted.write(line)
+                pasted.write('\n')
             
-            text = ' '.join(lines).strip()
+            text = pasted.getvalue().strip()
             
             if not text:
                 print("\n⚠️  No text provided. Please try again.")
                 continue
             
-            # Reset for new text
-            self.__init__()
-            self.original_text = text
-            
-            # Run reflection cycles
-            self.current_iteration = 1
-            while self.current_iteration <= self.max_iterations:
-                continue_reflection = self.reflection_cycle()
-                
-                if not continue_reflection:
-                    break
-                
-                self.current_iteration += 1
+            self.reflect(text)
             
             # Show final comparison
-            self.display_ui()
-            self.print_comparison()
-            
-            print("\n" + "="*80)
-            print("✅ REFLECTION PROCESS COMPLETE!")
-            print("="*80)
-            print(f"\nFinal Summary (Version {len(self.summaries)}):")
-            print("-" * 80)
-            print(self.summaries[-1])
-            print("-" * 80)
-            
-            print("\n💡 Key Improvements Made:")
-            all_improvements = []
-            for imp_list in self.improvements:
-                all_improvements.extend(imp_list)
-            unique_improvements = list(set(all_improvements))
-            for i, imp in enumerate(unique_improvements[:5], 1):
-                print(f"   {i}. {imp}")
-            
-            print("\n" + "="*80)
+            self.print_report()
             choice = input("\nEnter new text, type 'reset', or 'quit': ").strip().lower()
             if choice == 'quit':
                 print("\n👋 Thank you for using Self-Reflection AI. Goodbye!")
                 break
             elif choice == 'reset':
-                self.__init__()
+                self.reset()
                 continue
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Self-reflection summary demo")
+    parser.add_argument('--input', metavar='FILE',
+                        help="summarize this file ('-' for stdin) instead of pasted text; "
+                             "it is streamed, so large documents are fine")
+    parser.add_argument('--sentences', type=int, default=2, metavar='K',
+                        help="sentences in the initial extractive summary")
+    parser.add_argument('--idf', metavar='JSON',
+                        help="score terms with this saved vocabulary/IDF table")
+    parser.add_argument('--save-idf', metavar='JSON',
+                        help="add the summarized documents to the IDF table and save it here")
+    parser.add_argument('--converge', type=float, metavar='SIMILARITY',
+                        help="stop iterating once the summary or critique is at least this "
+                             "similar to the previous iteration's (0-1, e.g. 0.95)")
+    parser.add_argument('--corpus', metavar='PATH',
+                        help="summarize every document in a directory or JSONL file "
+                             "(one string, or an object with 'text' and optional 'id', per line)")
+    parser.add_argument('--output', default='-', metavar='JSONL',
+                        help="where corpus results go (default: stdout)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="processes summarizing corpus documents")
+    return parser.parse_args(argv)
+
+def make_summarizer(args: argparse.Namespace) -> ExtractiveSummarizer:
+    weights = TermWeights.load(args.idf) if args.idf else None
+    return ExtractiveSummarizer(weights, learn=bool(args.save_idf))
+
+def reflect_on_file(path: str, summarizer: ExtractiveSummarizer, sentences: int,
+                    converge: Optional[float] = None):
+    """Summarize one file (or stdin) and print the report"""
+    if path == '-':
+        # stdin carries the document, so there is nobody to answer prompts
+        tool = SelfReflectionAI(False, summarizer, sentences, converge)
+        tool.reflect(sys.stdin)
+        tool.print_report()
+        return
+    
+    tool = SelfReflectionAI(sys.stdin.isatty(), summarizer, sentences, converge)
+    with open(path, encoding='utf-8', errors='replace') as f:
+        preview = f.read(PREVIEW_CHARS + 1)
+        f.seek(0)
+        tool.reflect(f, preview)
+    tool.print_report()
+
+class Document(NamedTuple):
+    """A corpus document: its text or the file it lives in, or why it
+    could not be read"""
+    id: str
+    text: Optional[str] = None
+    path: Optional[str] = None
+    error: Optional[str] = None
+
+def parse_record(line: str, number: int) -> Document:
+    """One JSONL corpus line: a string, or an object with 'text' and optional 'id'"""
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return Document(str(number), error=f"invalid JSON: {e}")
+    if isinstance(record, str):
+        return Document(str(number), record)
+    if not isinstance(record, dict):
+        return Document(str(number), error="expected a string or an object")
+    doc_id = str(record.get('id', number))
+    if not isinstance(record.get('text'), str):
+        return Document(doc_id, error="missing 'text' string")
+    return Document(doc_id, record['text'])
+
+def iter_corpus(path: str) -> Iterator[Document]:
+    """Documents of a directory (every file, recursively, in name order)
+    or of a JSONL file; unreadable records come through with an error"""
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                yield Document(os.path.relpath(file_path, path), path=file_path)
+        return
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield parse_record(line, number)
+
+def read_document(text: Optional[str], path: Optional[str]) -> str:
+    if text is not None:
+        return text
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+# One reflection tool per corpus worker process, set up by the pool initializer
+_corpus_tool: Optional[SelfReflectionAI] = None
+
+def _init_corpus_worker(weights: TermWeights, sentences: int, converge: Optional[float]):
+    global _corpus_tool
+    _corpus_tool = SelfReflectionAI(False, ExtractiveSummarizer(weights), sentences, converge)
+
+def summarize_document(document: Document) -> Dict[str, Any]:
+    """Run the full reflection loop over one corpus document"""
+    doc_id, text, path, error = document
+    if error is not None:
+        return {'id': doc_id, 'error': error}
+    started = time.perf_counter()
+    try:
+        text = read_document(text, path)
+        if not text.strip():
+            return {'id': doc_id, 'chars': len(text), 'summary': "", 'iterations': []}
+        summary = _corpus_tool.reflect(text)
+    except (OSError, UnicodeError) as e:
+        return {'id': doc_id, 'error': str(e)}
+    stats = _corpus_tool.convergence_stats()
+    stats['seconds'] = round(time.perf_counter() - started, 6)
+    return {'id': doc_id,
+            'chars': len(text),
+            'summary': summary,
+            'iterations': _corpus_tool.trail(),
+            'convergence': stats,
+            'critique_sentences': {'scored': _corpus_tool.critic.scored,
+                                   'reused': _corpus_tool.critic.reused}}
+
+def summarize_corpus(documents: Iterable[Document], weights: TermWeights, sentences: int,
+                     workers: int, converge: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Results in corpus order; at most a few documents per worker are in
+    flight, so a corpus of any size streams through in bounded memory"""
+    if workers <= 1:
+        _init_corpus_worker(weights, sentences, converge)
+        yield from map(summarize_document, documents)
+        return
+    context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+    window = workers * 4
+    pending = deque()
+    with context.Pool(workers, _init_corpus_worker, (weights, sentences, converge)) as pool:
+        for document in documents:
+            pending.append(pool.apply_async(summarize_document, (document,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def reflect_on_corpus(args: argparse.Namespace, summarizer: ExtractiveSummarizer) -> int:
+    """Batch mode: summarize a corpus headlessly and write JSONL results;
+    returns how many documents failed"""
+    weights = summarizer.weights
+    if args.save_idf:
+        # Corpus frequencies are learned up front so every worker scores with them
+        for _, text, path, error in iter_corpus(args.corpus):
+            if error is None:
+                try:
+                    summarizer.fit(read_document(text, path))
+                except (OSError, UnicodeError):
+                    pass  # Reported with the results
+        weights.save(args.save_idf)
+    
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    started = time.perf_counter()
+    count = errors = iterations = 0
+    saved = 0.0
+    try:
+        for result in summarize_corpus(iter_corpus(args.corpus), weights, args.sentences,
+                                       args.workers, args.converge):
+            out.write(json.dumps(result, ensure_ascii=False))
+            out.write('\n')
+            count += 1
+            errors += 'error' in result
+            iterations += len(result.get('iterations', ()))
+            saved += result.get('convergence', {}).get('seconds_saved', 0.0)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"📚 Summarized {count} documents ({errors} failed) in {elapsed:.2f}s "
+          f"with {max(args.workers, 1)} worker(s): {count / elapsed if elapsed else 0:.1f} docs/sec",
+          file=sys.stderr)
+    if args.converge is not None:
+        print(f"🎯 {iterations} iterations in total, about {saved:.2f}s of worker time saved "
+              f"by converging at {args.converge:.0%}", file=sys.stderr)
+    return errors
+
 def main():
     """Entry point"""
+    args = parse_args()
+    summarizer = make_summarizer(args)
     try:
-        tool = SelfReflectionAI()
-        tool.run()
+        if args.corpus:
+            if reflect_on_corpus(args, summarizer):
+                sys.exit(1)
+            return
+        if args.input:
+            reflect_on_file(args.input, summarizer, args.sentences, args.converge)
+        else:
+            tool = SelfReflectionAI(summarizer=summarizer, summary_sentences=args.sentences,
+                                    converge=args.converge)
+            tool.run()
+        if args.save_idf:
+            summarizer.weights.save(args.save_idf)
     except KeyboardInterrupt:
         print("\n\n👋 Interrupted. Goodbye!")
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import re
+import shutil
+import sys
+import unicodedata
+from contextlib import contextmanager, redirect_stdout
+from io import StringIO
+from typing import List, Optional, TextIO
+
+# Colour/cursor escape sequences take no room on screen
+ANSI_ESCAPE = re.compile(r'\033\[[0-9;?]*[A-Za-z]')
+
+def display_width(text: str) -> int:
+    """Approximate the number of terminal cells ``text`` occupies"""
+    width = 0
+    for char in ANSI_ESCAPE.sub('', text):
+        if unicodedata.combining(char) or char == '\ufe0f':
+            continue
+        width += 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+    return width
+
+class TerminalRenderer:
+    """Redraw a full-screen UI by rewriting only the lines that changed.
+    
+    The previous frame is kept line by line; each new frame is diffed
+    against it and only changed rows are rewritten in place with ANSI
+    cursor addressing, all in a single buffered write. Whatever was printed
+    below the last frame (progress messages, prompts) is cleared. When the
+    frame may not fit on screen, or a line may wrap, the renderer falls
+    back to a full clear-and-redraw, which still needs no subprocess.
+    When the stream is not a terminal, frames are neither captured nor
+    rendered; whatever is printed goes straight to the stream.
+    """
+    
+    def __init__(self, stream: Optional[TextIO] = None, reserve: int = 8):
+        self.stream = stream or sys.stdout
+        # Rows kept free below the frame for prompts and messages, so that
+        # typing into them never scrolls the frame out of place
+        self.reserve = reserve
+        isatty = getattr(self.stream, 'isatty', None)
+        self.enabled = bool(isatty and isatty())
+        self._last: Optional[List[str]] = None
+        self._size = None
+    
+    def invalidate(self):
+        """Force the next frame to be drawn in full (e.g. after the screen scrolled)"""
+        self._last = None
+    
+    def clear(self):
+        """Clear the screen without spawning a process"""
+        if self.enabled:
+            self.stream.write("\033[H\033[2J")
+            self.stream.flush()
+        self._last = None
+    
+    @contextmanager
+    def frame(self):
+        """Capture everything printed inside the block and render it as one frame"""
+        if not self.enabled:
+            # Not a terminal: let the output through as is, with no capture or diffing
+            yield
+            return
+        buffer = StringIO()
+        with redirect_stdout(buffer):
+            yield
+        self.render(buffer.getvalue())
+    
+    def render(self, text: str):
+        """Draw ``text`` as the new frame"""
+        if not self.enabled:
+            return
+        
+        lines = text.split('\n')
+        if lines[-1]:
+            lines.append('')
+        size = shutil.get_terminal_size()
+        fits = (len(lines) + self.reserve <= size.lines
+                and all(display_width(line) < size.columns for line in lines))
+        
+        if self._last is None or not fits or size != self._size:
+            out = ["\033[H\033[2J", '\n'.join(lines)]
+            self._last = lines if fits else None
+        else:
+            out = []
+            previous = self._last
+            for row, line in enumerate(lines):
+                if row >= len(previous) or previous[row] != line:
+                    out.append(f"\033[{row + 1};1H{line}\033[K")
+            # Park the cursor below the frame and wipe anything left there
+            out.append(f"\033[{len(lines)};1H\033[J")
+            self._last = lines
+        
+        self._size = size
+        self.stream.write(''.join(out))
+        self.stream.flush()
@@ -0,0 +1,17 @@
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def load_script(name: str, filename: str):
+    """Import one of the demo scripts (their file names contain spaces)"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    # Registered before running so pickling and worker processes can find it
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import load_script
+
+support = load_script('support_chain', "Prompt Chaining for a Customer Support AI.py")
+
+MESSAGES = ["My app crashes on login", "Yes", "It blocks me completely", "Error 500 since Monday"]
+
+def converse(manager, sessions, messages=MESSAGES):
+    for text in messages:
+        for session_id in sessions:
+            manager.process_message(session_id, text)
+
+def views(manager, sessions):
+    return {session_id: manager.describe(session_id) for session_id in sessions}
+
+def test_restore_from_checkpoint(tmp_path):
+    path = str(tmp_path / 'sessions.ckpt')
+    sessions = [f"session-{i}" for i in range(20)]
+    manager = support.SessionManager(checkpoint=support.SessionCheckpoint(path))
+    converse(manager, sessions, MESSAGES[:2])
+    assert manager.checkpoint() == len(sessions)
+    # Later checkpoints only append what changed
+    converse(manager, sessions[:5], MESSAGES[2:])
+    manager.close(sessions[-1])
+    assert manager.checkpoint() == 5
+    assert manager.checkpoint() == 0
+    
+    restored = support.SessionManager(checkpoint=support.SessionCheckpoint(path))
+    assert len(restored) == len(sessions) - 1
+    assert views(restored, sessions[:-1]) == views(manager, sessions[:-1])
+    assert restored.describe(sessions[-1]) is None
+    
+    # A restored session carries on where it stopped
+    assert (restored.process_message(sessions[0], "Thanks")['step']
+            == manager.process_message(sessions[0], "Thanks")['step'])
+
+def test_torn_record_is_dropped(tmp_path):
+    path = str(tmp_path / 'sessions.ckpt')
+    manager = support.SessionManager(checkpoint=support.SessionCheckpoint(path))
+    converse(manager, ["a"])
+    manager.checkpoint()
+    expected = manager.describe("a")
+    converse(manager, ["b"])
+    manager.checkpoint()
+    with open(path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 3)
+    
+    restored = support.SessionManager(checkpoint=support.SessionCheckpoint(path))
+    assert restored.describe("a") == expected
+    assert restored.describe("b") is None
+
+def test_restore_reads_spilled_history(tmp_path):
+    path = str(tmp_path / 'sessions.ckpt')
+    
+    def manager():
+        log = support.SpillLog(str(tmp_path / 'spill'))
+        return support.SessionManager(history=support.ChatHistory(2, log),
+                                      checkpoint=support.SessionCheckpoint(path))
+    
+    first = manager()
+    converse(first, ["a", "b"])
+    first.checkpoint()
+    expected = views(first, ["a", "b"])
+    assert len(expected["a"]['chat_history']) > 2
+    # No close(): the spill log must already be on disk, as after a crash
+    assert views(manager(), ["a", "b"]) == expected
+
+def test_checkpoint_needs_a_persistent_spill_file(tmp_path):
+    with pytest.raises(ValueError):
+        support.SessionManager(history=support.ChatHistory(2),
+                               checkpoint=support.SessionCheckpoint(str(tmp_path / 'ckpt')))
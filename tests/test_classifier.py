@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from conftest import load_script
+
+support = load_script('support_chain', "Prompt Chaining for a Customer Support AI.py")
+
+WORDS = ["my", "the", "is", "and", "please", "help", "today", "again", "not", "working",
+         "credit", "card", "log", "in", "sign", "double", "charged", "app", "wifi", "hello"]
+
+def backlog(index, count: int, seed: int = 0):
+    """Messages mixing keyword tokens, phrases and filler words"""
+    rng = random.Random(seed)
+    terms = [' '.join(gram) for gram in index.terms] + WORDS
+    return [' '.join(rng.choice(terms) for _ in range(rng.randint(0, 12))).capitalize() + '!'
+            for _ in range(count)]
+
+def assert_same(index, texts):
+    batch = index.classify_batch(texts)
+    assert len(batch) == len(texts)
+    for text, (category, score) in zip(texts, batch):
+        expected_category, expected_score = index.classify(text)
+        assert category == expected_category, text
+        assert score == pytest.approx(expected_score)
+
+def test_batch_matches_classify():
+    assert_same(support.CATEGORY_INDEX, backlog(support.CATEGORY_INDEX, 2000))
+
+def test_batch_matches_classify_with_phrases_and_ties():
+    index = support.CategoryIndex({
+        'General': ['hello'],
+        'Billing': {'credit card': 2.0, 'double charged': 1.5, 'card': 0.5},
+        'Account': {'log in': 2.0, 'sign in': 2.0, 'card': 0.5},
+    }, default='General')
+    texts = backlog(index, 500, seed=1) + [
+        "", "...", "card", "credit", "card credit",
+        # A phrase must not be matched across two messages
+        "my credit", "card is declined",
+    ]
+    assert_same(index, texts)
+
+def test_empty_backlog():
+    assert support.CATEGORY_INDEX.classify_batch([]) == []
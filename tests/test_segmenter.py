@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from conftest import load_script
+
+reflection = load_script('self_reflection', "Self-Reflection Prompt for Improving Output.py")
+
+def segment(text: str, chunk_size: int = 1 << 16):
+    segmenter = reflection.SentenceSegmenter(chunk_size=chunk_size)
+    return [(sentence.offset, sentence.text) for sentence in segmenter.segment(text)]
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 9])
+def test_quote_after_terminator_across_chunks(chunk_size):
+    assert segment('"Really?" she asked.', chunk_size) == [(0, '"Really?"'), (10, 'she asked.')]
+
+def test_no_is_not_an_abbreviation():
+    assert segment("He said no. Then left.") == [(0, 'He said no.'), (12, 'Then left.')]
+
+def test_output_does_not_depend_on_chunk_size():
+    pieces = ['Hello', 'world', 'Dr.', 'e.g.', 'no', 'J.', ' ', '  ', '\n', '\n\n', '\n \n',
+              '.', '?', '!', '?"', '."', '?!', '...', ')', '"', '”', '3.14', 'a', 'b.']
+    rng = random.Random(7)
+    for _ in range(3000):
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+        expected = segment(text)
+        for chunk_size in (1, 2, 3, 5, 9):
+            assert segment(text, chunk_size) == expected, (text, chunk_size)
@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+from conftest import load_script
+
+support = load_script('support_chain', "Prompt Chaining for a Customer Support AI.py")
+
+MESSAGES = ["My app crashes on login", "Yes", "It blocks me completely"]
+
+def test_resize_keeps_spilled_history(tmp_path):
+    async def run():
+        manager = await support.ShardedSessionManager(
+            1, history_window=2, spill_file=str(tmp_path / 'spill')).start()
+        try:
+            sessions = [f"session-{i}" for i in range(12)]
+            for text in MESSAGES:
+                await manager.process_batch([(session_id, text) for session_id in sessions])
+            before = {sid: await manager.describe(sid) for sid in sessions}
+            
+            assert await manager.resize(2) > 0
+            after = {sid: await manager.describe(sid) for sid in sessions}
+            assert after == before
+            
+            # Moved sessions keep spilling into their new shard's log
+            await manager.process_batch([(sid, "Error 500 since Monday") for sid in sessions])
+            await manager.resize(3)
+            await manager.resize(1)
+            for sid in sessions:
+                history = (await manager.describe(sid))['chat_history']
+                assert history[:len(before[sid]['chat_history'])] == before[sid]['chat_history']
+                assert len(history) == len(before[sid]['chat_history']) + 2
+        finally:
+            await manager.stop()
+    
+    asyncio.run(run())
+
+def test_checkpoints_under_steady_load(tmp_path):
+    path = tmp_path / 'ckpt'
+    
+    async def run():
+        manager = await support.ShardedSessionManager(
+            1, checkpoint=str(path), checkpoint_interval=0.1).start()
+        try:
+            # Traffic never pauses for a whole interval
+            deadline = asyncio.get_running_loop().time() + 1.0
+            while asyncio.get_running_loop().time() < deadline:
+                await manager.process_batch([("busy", MESSAGES[0])])
+            return (tmp_path / 'ckpt.0').exists()
+        finally:
+            await manager.stop()
+    
+    assert asyncio.run(run())
+
+def test_restart_loads_checkpoints_of_a_larger_pool(tmp_path):
+    path = str(tmp_path / 'ckpt')
+    sessions = [f"session-{i}" for i in range(12)]
+    
+    async def grow():
+        manager = await support.ShardedSessionManager(1, checkpoint=path).start()
+        try:
+            await manager.resize(3)
+            for text in MESSAGES:
+                await manager.process_batch([(sid, text) for sid in sessions])
+            return {sid: await manager.describe(sid) for sid in sessions}
+        finally:
+            await manager.stop()
+    
+    async def restart():
+        manager = await support.ShardedSessionManager(1, checkpoint=path).start()
+        try:
+            return {sid: await manager.describe(sid) for sid in sessions}
+        finally:
+            await manager.stop()
+    
+    before = asyncio.run(grow())
+    assert sorted(os.listdir(tmp_path)) == ['ckpt.0', 'ckpt.1', 'ckpt.2']
+    assert asyncio.run(restart()) == before
+    # The retired workers' sessions were rehashed, so their files are gone
+    assert os.listdir(tmp_path) == ['ckpt.0']
@@ -0,0 +1,20 @@
+from conftest import load_script
+
+reflection = load_script('self_reflection', "Self-Reflection Prompt for Improving Output.py")
+
+LONG = ("Solar panels convert sunlight into electricity. Panels on roofs feed the grid. "
+        "Batteries store surplus electricity for the night. Grid operators balance supply. "
+        "Cloudy days lower panel output.")
+
+def test_every_document_is_learned(tmp_path):
+    summarizer = reflection.ExtractiveSummarizer(learn=True)
+    summarizer.summarize("Wind turbines spin.", k=2)
+    summarizer.summarize(LONG, k=2)
+    
+    path = str(tmp_path / 'idf.json')
+    summarizer.weights.save(path)
+    weights = reflection.TermWeights.load(path)
+    assert weights.documents == 2
+    # Terms of the short document count although it was never scored
+    assert weights.document_frequency[weights.vocabulary['turbines']] == 1
+    assert weights.document_frequency[weights.vocabulary['panels']] == 1
@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+
+from conftest import load_script
+
+support = load_script('support_chain', "Prompt Chaining for a Customer Support AI.py")
+
+TICKET = {'category': 'Billing', 'urgency': 'High', 'issue': "Charged twice",
+          'details': "Invoice 48213", 'solution': "Refund issued"}
+
+def test_save_flush_find_round_trip(tmp_path):
+    path = str(tmp_path / 'tickets.db')
+    store = support.TicketStore(path, batch_size=7)
+    try:
+        ids = [store.save(store.allocate(), dict(TICKET, urgency=urgency), session=f"s{i}")
+               for i, urgency in enumerate(['High', 'Low'] * 50)]
+        assert ids == sorted(ids) and len(set(ids)) == len(ids)
+        # Queued tickets are visible before they are committed
+        assert store.get(ids[0])['issue'] == "Charged twice"
+        
+        store.flush()
+        assert store.commits >= 1
+        high = store.find(category='Billing', urgency='High')
+        assert [ticket['id'] for ticket in high] == ids[::2]
+        assert high[0]['session'] == 's0'
+        
+        # Saving an existing id replaces the ticket
+        store.save(ids[1], dict(TICKET, urgency='High'), status='incomplete')
+        assert len(store.find(urgency='High', limit=1000)) == 51
+        assert store.find(status='incomplete')[0]['id'] == ids[1]
+    finally:
+        store.close()
+    
+    reopened = support.TicketStore(path)
+    try:
+        assert reopened.get(ids[-1])['urgency'] == 'Low'
+        # Ids keep increasing across restarts
+        assert reopened.allocate() > ids[-1]
+    finally:
+        reopened.close()
+
+def test_failed_commit_is_raised_instead_of_hanging(tmp_path):
+    path = str(tmp_path / 'tickets.db')
+    store = support.TicketStore(path)
+    try:
+        store.save(store.allocate(), TICKET)
+        store.flush()
+        db = sqlite3.connect(path)
+        db.execute("DROP TABLE tickets")
+        db.commit()
+        db.close()
+        store.save(store.allocate(), TICKET)
+        
+        outcome = []
+        
+        def flush():
+            try:
+                store.flush()
+                outcome.append(None)
+            except sqlite3.Error as e:
+                outcome.append(e)
+        
+        flusher = threading.Thread(target=flush, daemon=True)
+        flusher.start()
+        flusher.join(10)
+        assert not flusher.is_alive(), "flush() hung after a failed commit"
+        assert isinstance(outcome[0], sqlite3.OperationalError)
+        # The error is reported once and the writer is still running
+        store.flush()
+    finally:
+        store.close()